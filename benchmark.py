@@ -0,0 +1,346 @@
+"""
+
+Benchmarks for the Summit Register hike catalog, run headless against synthetic catalogs.
+
+memory:     bytes held by a catalog of Hike records against the raw tuples the database cursor returns
+difficulty: rescoring the whole catalog after a difficulty formula change, in one pass over the stat columns
+            against rebuilding every Hike record
+startup:    loading the catalog from a snapshot and from a SQLite file into a HikeIndex, with the memory peak, and
+            building the keyword postings the app leaves until the catalog is on screen
+search:     HikeIndex.search for keyword, range, difficulty and distance from home queries
+sort:       sorting every row on each table column, with a cold and a warm sort cache
+populate:   showing, scrolling and sorting a HikeTable. needs Tk, so it runs under Xvfb when there is no display
+            and is skipped when neither is available
+
+Results are printed and can be written as JSON. Given a baseline (an earlier JSON output), any metric more than
+--tolerance slower or bigger than its baseline counts as a regression and the exit status is 1.
+
+Usage: python benchmark.py [--sizes 1000,10000,100000] [--only search,sort] [--json PATH] [--baseline PATH]
+
+"""
+
+import argparse
+import atexit
+import json
+import math
+import os
+import platform
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+import tracemalloc
+
+import main
+from main import (Difficulty, Hike, HikeIndex, HikeQuery, HikeTable, SQLiteStorage, SnapshotStorage, DEFAULT_HOME,
+                  difficulty_score, difficulty_scores, haversine_km, read_catalog)
+
+
+# (name, trailhead latitude, longitude, elevation in ft) of the areas hikes are spread over
+AREAS = (
+    ("Snoqualmie Pass", 47.42, -121.41, 3000),
+    ("Mt Rainier", 46.85, -121.76, 4500),
+    ("North Cascades", 48.70, -121.20, 2500),
+    ("Olympics", 47.80, -123.60, 1500),
+    ("Issaquah Alps", 47.50, -122.00, 500),
+    ("Stevens Pass", 47.75, -121.09, 3000),
+    ("Mountain Loop", 48.07, -121.55, 1800),
+    ("Teanaway", 47.33, -120.90, 3200),
+)
+FEATURES = ("Lake", "Peak", "Ridge", "Falls", "Lookout", "Pass", "Meadows", "Creek")
+KEYWORDS = ("waterfall", "views", "old growth", "alpine lake", "wildflowers", "scramble", "larches", "dog friendly")
+
+# timings within this many seconds of their baseline never count as regressions, they are timer noise
+NOISE_FLOOR = 0.0005
+
+
+# rows shaped like the hikes table, with distributions like a real catalog: lengths are log-normal around 6 miles,
+# climb grows with length, high points sit above the area's trailhead elevation, about a third of hikes go to a peak
+# and trailheads cluster around their area. the database driver hands back a new string object for every text value,
+# so strings are copied instead of shared like literals would be
+def synthetic_rows(count, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for hike_id in range(1, count + 1):
+        area, lat, lon, base = rng.choice(AREAS)
+        miles = round(min(max(rng.lognormvariate(math.log(6), 0.55), 0.5), 40), 1)
+        gain = max(0, round(miles * rng.gauss(450, 200)))
+        max_elev = max(0, round(base + rng.gauss(0, 600))) + round(gain * rng.uniform(0.5, 1.0))
+        if rng.random() < 0.05:
+            lat = lon = None
+            hours = 2.0
+        else:
+            lat, lon = round(lat + rng.gauss(0, 0.15), 5), round(lon + rng.gauss(0, 0.2), 5)
+            hours = round(haversine_km(lat, lon, *DEFAULT_HOME) / 60 + 0.3, 1)
+        rows.append((
+            hike_id,
+            "%s %s %d" % (rng.choice(FEATURES), rng.choice(("Trail", "Loop", "Route", "Way")), hike_id),
+            miles,
+            gain,
+            max_elev,
+            rng.randint(100, 3000) if rng.random() < 0.3 else 0,
+            Difficulty.from_score(difficulty_score(miles, gain, max_elev)).label.encode().decode(),
+            area.encode().decode(),
+            hours,
+            int(rng.random() < 0.2),
+            int(rng.random() < 0.1),
+            ", ".join(rng.sample(KEYWORDS, rng.randint(1, 2))).encode().decode(),
+            lat,
+            lon,
+        ))
+    return rows
+
+
+# bytes still allocated by what build() returns, and the peak while building it
+def allocated(build):
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+# seconds per call of fn, best of repeat
+def best_time(fn, repeat=5):
+    times = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def build_index(rows):
+    index = HikeIndex([Hike.from_row(row) for row in rows])
+    index.text_index.build(len(index))
+    return index
+
+
+# the rows are generated inside each measurement, so every catalog owns its strings the way a loaded one does
+def memory(rows):
+    tuples = allocated(lambda: synthetic_rows(len(rows)))[0]
+    hikes = allocated(lambda: [Hike.from_row(row) for row in synthetic_rows(len(rows))])[0]
+    index, peak = allocated(lambda: build_index(synthetic_rows(len(rows))))
+    return {"tuples_bytes": tuples, "hikes_bytes": hikes, "index_bytes": index, "index_peak_bytes": peak}
+
+
+def difficulty(rows):
+    miles, gains, max_elevs = [row[2] for row in rows], [row[3] for row in rows], [row[4] for row in rows]
+    return {
+        "rescore_columns_s": best_time(lambda: difficulty_scores(miles, gains, max_elevs)),
+        "rebuild_records_s": best_time(lambda: [Hike.from_row(row) for row in rows], repeat=3),
+    }
+
+
+# read every row from storage the way the loader does, then build the index
+def load(source):
+    hikes = [Hike.from_row(row) for row in read_catalog(source, queue.SimpleQueue())]
+    return HikeIndex(hikes)
+
+
+def startup(rows):
+    metrics = {}
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = os.path.join(directory, "catalog.snapshot")
+        SnapshotStorage(snapshot_path).write_hikes(rows, "")
+        database = SQLiteStorage(os.path.join(directory, "catalog.db"))
+        database.write_hikes(rows)
+
+        def from_snapshot():
+            source = SnapshotStorage(snapshot_path)
+            index = load(source)
+            source.close()
+            return index
+
+        metrics["snapshot_s"] = best_time(from_snapshot, repeat=3)
+        metrics["sqlite_s"] = best_time(lambda: load(database), repeat=3)
+        indexes = [from_snapshot() for i in range(3)]
+        metrics["text_index_s"] = min(best_time(lambda: index.text_index.build(len(rows)), repeat=1)
+                                      for index in indexes)
+        metrics["snapshot_peak_bytes"] = allocated(from_snapshot)[1]
+        database.connection().close()
+    return metrics
+
+
+# representative searches from the search form
+QUERIES = {
+    "keyword": HikeQuery("lake", ()),
+    "keyword_rare": HikeQuery("lookout loop 7", ()),
+    "keyword_range": HikeQuery("falls", (("distance", None, 5.0),)),
+    "range_selective": HikeQuery("", (("elev_gain", 5000.0, None),)),
+    "range_broad": HikeQuery("", (("distance", None, 15.0),)),
+    "difficulty": HikeQuery("", (("difficulty_score", None, Difficulty.MODERATE.ceiling),)),
+    "combined": HikeQuery("", (("distance", None, 8.0), ("difficulty_score", None, Difficulty.HARD.ceiling),
+                               ("max_elev", 5000.0, None))),
+    "within_60km": HikeQuery("", (("km_from_home", None, 60.0),)),
+}
+
+
+def search(rows):
+    index = build_index(rows)
+    index.search(QUERIES["within_60km"])  # builds the trailhead tree, a one-off
+    return {name + "_s": best_time(lambda: index.search(query)) for name, query in QUERIES.items()}
+
+
+def sort(rows):
+    index = build_index(rows)
+    all_rows = list(index.live_ids())
+    metrics = {}
+    for column in index.sort_columns:
+        def cold():
+            index.sort_cache.clear()
+            index.sort_rows(column, all_rows)
+        metrics[column + "_cold_s"] = best_time(cold, repeat=3)
+        metrics[column + "_warm_s"] = best_time(lambda: index.sort_rows(column, all_rows, reverse=True))
+    return metrics
+
+
+# a Tk root, starting a virtual X display with Xvfb when there is no display to open. None if neither works
+def tk_root():
+    try:
+        return tk.Tk()
+    except tk.TclError:
+        pass
+    if shutil.which("Xvfb") is None:
+        return None
+    display = ":%d" % (100 + os.getpid() % 400)
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    atexit.register(server.terminate)
+    os.environ["DISPLAY"] = display
+    for attempt in range(50):
+        time.sleep(0.1)
+        try:
+            return tk.Tk()
+        except tk.TclError:
+            pass
+    return None
+
+
+# HikeTable draws from main's hike_index, so the benchmark catalog is swapped in for it
+def populate(rows, root):
+    main.hike_index = index = build_index(rows)
+    frame = tk.Frame(root)
+    frame.pack()
+    table = HikeTable(frame, lambda *args: None)
+    all_rows = list(index.live_ids())
+
+    def show():
+        index.display_cache.clear()
+        table.show(all_rows)
+        root.update_idletasks()
+
+    def scroll():
+        for top in range(0, min(len(all_rows), 200 * table.visible_rows), table.visible_rows):
+            table.scroll_to(top)
+        root.update_idletasks()
+
+    def sort_table():
+        index.sort_cache.clear()
+        table.sort("total_distance", False)
+        root.update_idletasks()
+
+    metrics = {"show_s": best_time(show), "scroll_200_pages_s": best_time(scroll), "sort_s": best_time(sort_table)}
+    HikeTable.instances.remove(table)
+    frame.destroy()
+    return metrics
+
+
+BENCHMARKS = {
+    "memory": memory,
+    "difficulty": difficulty,
+    "startup": startup,
+    "search": search,
+    "sort": sort,
+    "populate": populate,
+}
+
+
+def format_value(metric, value):
+    if metric.endswith("_bytes"):
+        return "%10.1f MB" % (value / 1e6)
+    return "%10.3f ms" % (value * 1e3)
+
+
+# {size: {benchmark.metric: value}} for each catalog size
+def run(sizes, names):
+    root = tk_root() if "populate" in names else None
+    if "populate" in names and root is None:
+        print("populate: skipped, no display and no Xvfb")
+    results = {}
+    for size in sizes:
+        rows = synthetic_rows(size)
+        metrics = {}
+        for name in names:
+            if name == "populate":
+                if root is None:
+                    continue
+                found = populate(rows, root)
+            else:
+                found = BENCHMARKS[name](rows)
+            for metric, value in found.items():
+                metrics[name + "." + metric] = value
+                print("%8d  %-36s %s" % (size, name + "." + metric, format_value(metric, value)))
+        results[str(size)] = metrics
+    if root is not None:
+        root.destroy()
+    return results
+
+
+# metrics more than tolerance above their baseline, as (size, metric, baseline, value)
+def regressions(results, baseline, tolerance):
+    found = []
+    for size, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(size, {}).get(metric)
+            if base is None or value <= base * (1 + tolerance):
+                continue
+            if not metric.endswith("_bytes") and value - base < NOISE_FLOOR:
+                continue
+            found.append((size, metric, base, value))
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summit Register benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated catalog sizes, up to 1000000 (default 1000,10000,100000)")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help="comma separated benchmarks to run (default all: %s)" % ", ".join(BENCHMARKS))
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="share a metric may exceed its baseline before it is a regression (default 0.25)")
+    args = parser.parse_args()
+
+    names = [name for name in args.only.split(",") if name]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark: " + ", ".join(unknown))
+    results = run([int(size) for size in args.sizes.split(",")], names)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results,
+            }, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        found = regressions(results, baseline, args.tolerance)
+        for size, metric, base, value in found:
+            print("REGRESSION %8s  %-36s %s -> %s (%+.0f%%)" % (
+                size, metric, format_value(metric, base).strip(), format_value(metric, value).strip(),
+                100 * (value / base - 1)))
+        if found:
+            sys.exit(1)
+        print("no regressions against " + args.baseline)
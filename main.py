@@ -10,41 +10,2782 @@ Last updated 14 December 20
 
 
 - TO DO -
-[ ] fix treeview sort algorithm, not behaving properly with numbers (places 10 before 2, only looks at first digit)
-[ ] add ability to add new hikes (and write to database)
-[ ] add ability to save notes/completion status to database
-[ ] use a loop to populate treeview headings instead of current sloppy code
+[x] fix treeview sort algorithm, not behaving properly with numbers (places 10 before 2, only looks at first digit)
+[x] add ability to add new hikes (and write to database)
+[x] add ability to save notes/completion status to database
+[x] use a loop to populate treeview headings instead of current sloppy code
 [ ] *consider* adding photo and google maps link for each hike. this would take forever..
 [ ] change 'complete' from radio button to checkbox
-[ ] implement google maps to enable user to set their home location and use to determine actual distances to trailhead
+[x] implement google maps to enable user to set their home location and use to determine actual distances to trailhead
 
 """
 
+import time
+
+# for measuring time to first paint, taken before the imports so their cost counts too
+START_TIME = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import webbrowser
+import argparse
+import bisect
+import csv
+import heapq
+import json
+import math
+import mmap
+import os
+import queue
+import re
+import sqlite3
+import struct
+import sys
+import threading
+from contextlib import contextmanager
+from array import array
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
+from itertools import count, islice
+from operator import attrgetter
+from urllib.parse import quote_plus
+from xml.etree import ElementTree
 from PIL import Image, ImageTk
 import mysql.connector
+import mysql.connector.pooling
+
+# connection settings for the hikes database
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "***********",
+    "database": "hikes"
+}
+
+# pooled connections: how many, how long (seconds) to wait for a free one, and how often to retry a dead server
+# starting from DB_RETRY_DELAY seconds and doubling each time
+DB_POOL_SIZE = 4
+DB_POOL_TIMEOUT = 10
+DB_RETRIES = 4
+DB_RETRY_DELAY = 0.5
+
+# user notes per hike id, kept in the hike_notes table
+hike_notes = {}
+# False when the catalog came from the snapshot without a database, so hike_notes is empty rather than loaded. saves
+# leave the stored notes alone then
+notes_loaded = True
+
+# rows fetched per round trip while loading, and how often (ms) the ui checks on the loader
+LOAD_BATCH_SIZE = 2000
+LOAD_POLL_INTERVAL = 50
+
+# rows per tk callback added to the keyword postings once the catalog is on screen
+TEXT_INDEX_CHUNK = 2000
+
+# rows written per transaction when importing a trail file, and how many rejected rows an import reports in detail
+IMPORT_BATCH_SIZE = 5000
+IMPORT_ERRORS_SHOWN = 20
+
+# GPX tracks recorded on hikes, named <hike id>.gpx. the elevation profile derived from each is cached beside it as
+# <hike id>.profile.json
+TRACKS_DIR = "tracks"
+
+# meters of trail elevations are averaged over before climbs are summed, and meters a climb has to reach before it
+# counts, so gps jitter doesn't add up to gain. then points kept in a cached elevation profile
+TRACK_SMOOTHING_M = 100
+TRACK_CLIMB_THRESHOLD_M = 3
+PROFILE_POINTS = 200
+
+# local copy of the catalog, so startup reads the file and only fetches rows changed since it was written
+CATALOG_SNAPSHOT = "catalog.snapshot"
+
+# seconds between checks for catalog changes, and how often (ms) the ui picks up changes that were found
+SYNC_INTERVAL = 30
+SYNC_POLL_INTERVAL = 500
+
+# user settings such as the home location, kept next to the app
+SETTINGS_FILE = "settings.json"
+
+# (latitude, longitude) distances are measured from until a home location is set. Tacoma, which the static hours
+# from home column was measured from
+DEFAULT_HOME = (47.2529, -122.4443)
+
+# OpenStreetMap XML extract of the roads around home. when it is there, drive times are routed over it offline and
+# replace the static hours from home column
+ROAD_GRAPH_FILE = "roads.osm"
+
+# drive times per home location, so restarting or going back to an earlier home skips routing, and how many homes
+# it remembers
+DRIVE_TIMES_FILE = "drive_times.json"
+DRIVE_TIMES_HOMES = 8
+
+# km/h assumed between home or a trailhead and the nearest road node
+ACCESS_SPEED = 30
+
+# seconds the write-behind queue waits for more edits before flushing, and before retrying a failed flush
+WRITE_FLUSH_DELAY = 1
+WRITE_RETRY_DELAY = 5
+
+# edits the database couldn't take before the app closed, sent again on the next start
+PENDING_EDITS_FILE = "pending_edits.json"
+
+# decoded image memory the image cache may hold before evicting
+IMAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+# images the frames and detail pop ups use, decoded in the background at startup
+APP_IMAGES = ("peak_pro_main_bg.jpg", "search_title.png", "search_results.png", "my_hikes.png", "all_hikes.png",
+              "hike_details_bg.jpg", "summit_photo.jpg")
+
+# profiling (--profile): events kept in the ring buffer, how often (ms) the tk event loop's latency is sampled, and
+# how many of the latest spans the debug overlay (F12) lists and how often (ms) it refreshes
+PROFILE_BUFFER = 20000
+PROFILE_SAMPLE_INTERVAL = 100
+PROFILE_OVERLAY_ROWS = 20
+PROFILE_OVERLAY_REFRESH = 500
+
+
+# a timed span that records itself into the profiler's ring buffer when it ends
+class Span:
+
+    __slots__ = ("events", "name", "args", "start")
+
+    def __init__(self, events, name, args):
+        self.events = events
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.events.append(("span", self.name, self.start, time.perf_counter() - self.start, threading.get_ident(),
+                            self.args))
+
+
+# what span() hands out while profiling is off, so an instrumented block costs one call and an empty with
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+# opt-in instrumentation. hot paths are wrapped in `with profiler.span(name, **args):`, and the tk event loop's
+# latency is sampled while it runs. events go to a ring buffer of the latest PROFILE_BUFFER as
+# (kind, name, start, seconds, thread id, args) with start on the perf_counter clock, and can be exported as JSON
+# or in the Chrome trace format chrome://tracing and Perfetto open
+class Profiler:
+
+    def __init__(self, size=PROFILE_BUFFER):
+        self.enabled = False
+        self.events = deque(maxlen=size)  # appends are atomic, so worker threads record without a lock
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self.events, name, args)
+
+    # a measured value, such as how late a timer ran
+    def sample(self, name, seconds):
+        if self.enabled:
+            self.events.append(("sample", name, time.perf_counter(), seconds, threading.get_ident(), None))
+
+    # the latest count events of a kind, newest first
+    def latest(self, kind, count):
+        found = []
+        for event in reversed(list(self.events)):
+            if event[0] == kind:
+                found.append(event)
+                if len(found) == count:
+                    break
+        return found
+
+    # events as dicts, times in ms since the app started
+    def as_json(self):
+        return [{"kind": kind, "name": name, "start_ms": (start - START_TIME) * 1000, "ms": seconds * 1000,
+                 "thread": thread, "args": args or {}}
+                for kind, name, start, seconds, thread, args in list(self.events)]
+
+    # spans as complete ("X") events and samples as counters, times in microseconds
+    def chrome_trace(self):
+        trace = []
+        pid = os.getpid()
+        for kind, name, start, seconds, thread, args in list(self.events):
+            ts = (start - START_TIME) * 1e6
+            if kind == "span":
+                trace.append({"name": name, "cat": name.split(".")[0], "ph": "X", "ts": ts, "dur": seconds * 1e6,
+                              "pid": pid, "tid": thread, "args": args})
+            else:
+                trace.append({"name": name, "ph": "C", "ts": ts, "pid": pid, "tid": thread,
+                              "args": {"ms": seconds * 1000}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export(self, path, chrome=True):
+        with open(path, "w") as file:
+            json.dump(self.chrome_trace() if chrome else self.as_json(), file)
+
+
+profiler = Profiler()
+
+
+# version of the difficulty_score formula. scores stored in the database by an older version are recomputed when
+# the catalog is opened, so bump this whenever the formula changes
+DIFFICULTY_VERSION = 1
+
+# difficulty scores at the top of the easy, moderate and hard bands, anything above is expert
+DIFFICULTY_CEILINGS = (6.0, 12.0, 20.0)
+
+
+# difficulty bands of the difficulty score, shown in the tables and offered as ceilings by the search form
+class Difficulty(IntEnum):
+    EASY = 1
+    MODERATE = 2
+    HARD = 3
+    EXPERT = 4
+
+    # text shown in the tables
+    @property
+    def label(self):
+        return self.name.capitalize()
+
+    # highest score in the band
+    @property
+    def ceiling(self):
+        return DIFFICULTY_CEILINGS[self - 1] if self < Difficulty.EXPERT else math.inf
+
+    @classmethod
+    def from_score(cls, score):
+        return cls(bisect.bisect_left(DIFFICULTY_CEILINGS, score) + 1)
+
+
+# effort score of a trail from its statistics. starts from energy miles (a mile plus a mile per 500 ft climbed),
+# then adds for an average grade on the way up steeper than 10% (assuming half the distance climbs) and for a high
+# point above 8000 ft, where the air thins
+def difficulty_score(miles, gain, max_elev):
+    grade = gain / (miles * 5280 / 2) * 100 if miles > 0 else 0.0
+    return (miles + gain / 500) * (1 + max(grade - 10, 0) / 40) * (1 + max(max_elev - 8000, 0) / 10000)
+
+
+# difficulty scores for whole columns of miles, gains and high points in one pass
+def difficulty_scores(miles, gains, max_elevs):
+    return array("d", map(difficulty_score, miles, gains, max_elevs))
+
+
+# float from a nullable column, None for NULL and for the NaN snapshots store in its place
+def optional_float(value):
+    if value is None or value != value:
+        return None
+    return float(value)
+
+
+# one hike. __slots__ keeps each record smaller than the cursor tuple it is built from, numbers are converted once
+# on load, and fields are read by name instead of by column position
+class Hike:
+
+    __slots__ = ("id", "name", "distance", "elev_gain", "max_elev", "prominence", "difficulty", "area",
+                 "hours_from_home", "complete", "my_hike", "keywords", "lat", "lon", "difficulty_score")
+
+    def __init__(self, id, name, distance, elev_gain, max_elev, prominence, difficulty, area, hours_from_home,
+                 complete, my_hike, keywords, lat=None, lon=None, difficulty_score=0.0):
+        self.id = id
+        self.name = name
+        self.distance = distance  # miles
+        self.elev_gain = elev_gain  # ft
+        self.max_elev = max_elev  # ft
+        self.prominence = prominence  # ft, 0 for hikes that don't go to a peak
+        self.difficulty = difficulty
+        self.area = area
+        self.hours_from_home = hours_from_home  # inf if unknown, which no hours filter matches and sorts last
+        self.complete = complete
+        self.my_hike = my_hike
+        self.keywords = keywords
+        self.lat = lat  # trailhead, None if unknown
+        self.lon = lon
+        self.difficulty_score = difficulty_score  # difficulty is its band
+
+    # build from a row in hikes table column order (HIKE_COLUMNS). area names repeat across the catalog, so one
+    # copy of each is shared. difficulty is scored from the trail's statistics, the free-text rating isn't used
+    @classmethod
+    def from_row(cls, row):
+        distance, elev_gain, max_elev = float(row[2]), int(row[3]), int(row[4])
+        score = difficulty_score(distance, elev_gain, max_elev)
+        hours = optional_float(row[8])
+        return cls(row[0], row[1], distance, elev_gain, max_elev, int(row[5] or 0), Difficulty.from_score(score),
+                   sys.intern(row[7]), math.inf if hours is None else hours, int(row[9]), int(row[10]),
+                   row[11] or "", optional_float(row[12]), optional_float(row[13]), score)
+
+    # google maps link to the trailhead, or a search for it when its coordinates are unknown
+    def maps_url(self):
+        if self.lat is None:
+            return "https://www.google.com/maps/search/?api=1&query=" + quote_plus(self.name + " trailhead")
+        return "https://www.google.com/maps/search/?api=1&query=%f,%f" % (self.lat, self.lon)
+
+    def astuple(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    # a copy with some fields changed
+    def replace(self, **changes):
+        return Hike(*[changes.get(field, getattr(self, field)) for field in self.__slots__])
+
+    def __eq__(self, other):
+        return isinstance(other, Hike) and self.astuple() == other.astuple()
+
+    def __repr__(self):
+        return "Hike(%r, %r)" % (self.id, self.name)
+
+
+# pack an iterable of booleans into an int bitset, bit i is set for row i
+def to_mask(flags):
+    bits = "".join(["1" if flag else "0" for flag in flags])
+    return int(bits[::-1], 2) if bits else 0
+
+
+# unpack an int bitset into a list of row ids
+def mask_ids(mask):
+    bits = bin(mask)[:1:-1]
+    return [i for i, bit in enumerate(bits) if bit == "1"]
+
+
+# search parameters from the search form. keyword is lowercase ("" for none), ranges is a tuple of
+# (column, low, high) with None for an open end
+HikeQuery = namedtuple("HikeQuery", ["keyword", "ranges"])
+
+
+# true if [low, high] lies within [base_low, base_high]
+def covers(base_low, base_high, low, high):
+    return (base_low is None or (low is not None and low >= base_low)) and \
+        (base_high is None or (high is not None and high <= base_high))
+
+
+# true if every row matching query also matches base, i.e. query only extends base's keyword and adds to or
+# tightens its ranges. a refined query can be answered by filtering base's results
+def refines(query, base):
+    if base.keyword not in query.keyword:
+        return False
+    for column, base_low, base_high in base.ranges:
+        if not any(covers(base_low, base_high, low, high) for col, low, high in query.ranges if col == column):
+            return False
+    return True
+
+
+# true if value lies within [low, high], either end may be None
+def in_range(value, low, high):
+    return (low is None or low <= value) and (high is None or value <= high)
+
+
+# sorted secondary index over one column, kept as parallel lists of values and row ids ordered by value. a range
+# lookup is two bisects plus a slice, and the match count for the query planner is just the two bisects
+class SortedIndex:
+
+    def __init__(self, values):
+        self.row_ids = sorted(range(len(values)), key=values.__getitem__)
+        self.keys = [values[i] for i in self.row_ids]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def bounds(self, low, high):
+        start = 0 if low is None else bisect.bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect.bisect_right(self.keys, high)
+        return start, max(start, end)
+
+    def count(self, low, high):
+        start, end = self.bounds(low, high)
+        return end - start
+
+    def lookup(self, low, high):
+        start, end = self.bounds(low, high)
+        return self.row_ids[start:end]
+
+    def insert(self, value, row_id):
+        pos = bisect.bisect_right(self.keys, value)
+        self.keys.insert(pos, value)
+        self.row_ids.insert(pos, row_id)
+
+    def remove(self, value, row_id):
+        start = bisect.bisect_left(self.keys, value)
+        pos = self.row_ids.index(row_id, start, bisect.bisect_right(self.keys, value))
+        del self.keys[pos]
+        del self.row_ids[pos]
+
+
+# split lowercase text into overlapping n-grams
+def ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+# inverted index over the name, general area and keyword columns. postings map trigrams to sorted arrays of row ids,
+# 8 bytes an entry where a set of ints costs several times that. a substring search only verifies the rows of the
+# keyword's rarest trigram, and keywords shorter than a trigram match too much for postings to narrow it, so they
+# scan the texts. building the postings is most of the cost of loading a catalog, so texts passed in up front are
+# only posted as build is called; searches scan the rows it hasn't reached yet
+class TextIndex:
+
+    gram_size = 3
+
+    def __init__(self, texts=()):
+        self.texts = list(texts)  # row id -> lowercase "name\narea\nkeywords", None once removed
+        self.grams = {}  # trigram -> sorted array of row ids
+        self.count = len(self.texts)
+        self.indexed = 0  # rows below this row id are in the postings
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def text(name, *fields):
+        return "\n".join((name,) + fields).lower()
+
+    # post up to rows more of the texts given to the constructor, returns True once every row is in the postings
+    def build(self, rows):
+        end = min(self.indexed + rows, len(self.texts))
+        grams = self.grams
+        # every posting so far is below indexed, so these row ids only ever append
+        for row_id, text in enumerate(self.texts[self.indexed:end], self.indexed):
+            if text is None:
+                continue
+            for gram in ngrams(text, self.gram_size):
+                row_ids = grams.get(gram)
+                if row_ids is None:
+                    grams[gram] = array("l", (row_id,))
+                else:
+                    row_ids.append(row_id)
+        # a search on another thread reads indexed before the postings, so it only moves once they are complete
+        self.indexed = end
+        return end == len(self.texts)
+
+    def post(self, row_id, text):
+        # rows are mostly added in row id order, so a posting is usually appended to
+        for gram in ngrams(text, self.gram_size):
+            row_ids = self.grams.get(gram)
+            if row_ids is None:
+                self.grams[gram] = array("l", (row_id,))
+            elif row_ids[-1] < row_id:
+                row_ids.append(row_id)
+            else:
+                bisect.insort(row_ids, row_id)
+
+    def add(self, row_id, name, *fields):
+        text = self.text(name, *fields)
+        built = self.indexed == len(self.texts)
+        if row_id >= len(self.texts):
+            self.texts += [None] * (row_id + 1 - len(self.texts))
+        self.texts[row_id] = text
+        self.count += 1
+        # while build is still catching up, rows past it are left for build to post
+        if built:
+            self.indexed = len(self.texts)
+        if row_id < self.indexed:
+            self.post(row_id, text)
+
+    def remove(self, row_id):
+        text = self.texts[row_id]
+        self.texts[row_id] = None
+        self.count -= 1
+        if row_id >= self.indexed:
+            return
+        for gram in ngrams(text, self.gram_size):
+            row_ids = self.grams[gram]
+            del row_ids[bisect.bisect_left(row_ids, row_id)]
+            if not row_ids:
+                del self.grams[gram]
+
+    # re-index a row whose text changed
+    def update(self, row_id, name, *fields):
+        if self.texts[row_id] != self.text(name, *fields):
+            self.remove(row_id)
+            self.add(row_id, name, *fields)
+
+    # rows containing keyword anywhere in name, area or keywords, best matches first
+    def search(self, keyword):
+        keyword = keyword.lower()
+        indexed = self.indexed if len(keyword) >= self.gram_size else 0
+        unposted = [row_id for row_id, text in enumerate(self.texts[indexed:], indexed)
+                    if text is not None and keyword in text]
+        if not indexed:
+            return self.rank(unposted, keyword)
+        postings = [self.grams.get(gram) for gram in ngrams(keyword, self.gram_size)]
+        if None in postings:
+            return self.rank(unposted, keyword)
+        posted = min(postings, key=len)
+        return self.rank(list(posted[:bisect.bisect_left(posted, indexed)]) + unposted, keyword)
+
+    # the rows of ascending row_ids containing keyword, best match first: whole name, start of name, start of a word
+    # in the name, anywhere in the name, other columns, and by row id within each. with only five ranks, one pass
+    # sorts the rows into them rather than sorting by a key function
+    def rank(self, row_ids, keyword):
+        texts = self.texts
+        size = len(keyword)
+        word = " " + keyword
+        whole, start, word_start, inside, elsewhere = [], [], [], [], []
+        for row_id in row_ids:
+            text = texts[row_id]
+            if text is None:
+                continue
+            pos = text.find(keyword)
+            if pos < 0:
+                continue
+            name_end = text.find("\n")
+            if pos + size > name_end:
+                elsewhere.append(row_id)
+            elif pos == 0:
+                (whole if name_end == size else start).append(row_id)
+            elif text.find(word, 0, name_end) >= 0:
+                word_start.append(row_id)
+            else:
+                inside.append(row_id)
+        return whole + start + word_start + inside + elsewhere
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_MILE = 1.609344
+FEET_PER_METER = 3.28084
+
+
+# point on the unit sphere for a latitude and longitude in degrees
+def unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+# great-circle distance between two points (haversine formula)
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# straight-line distance through the unit sphere for a great-circle distance, and back. chord length grows with arc
+# length, so "within r km" is the same question as "within chord(r) in 3-d"
+def chord_length(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def chord_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+# static 3-d tree over (x, y, z, row id) points, stored as one list where each subrange's median splits it on
+# x, y or z in turn. a sphere search only descends into halves the sphere reaches, O(log n + k)
+class KDTree:
+
+    def __init__(self, points):
+        self.points = list(points)
+        stack = [(0, len(self.points), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo <= 1:
+                continue
+            self.points[lo:hi] = sorted(self.points[lo:hi], key=lambda point: point[axis])
+            mid = (lo + hi) // 2
+            stack.append((lo, mid, (axis + 1) % 3))
+            stack.append((mid + 1, hi, (axis + 1) % 3))
+
+    def __len__(self):
+        return len(self.points)
+
+    # row ids of the points within radius of center
+    def within(self, center, radius):
+        found = []
+        limit = radius * radius
+        points = self.points
+        stack = [(0, len(points), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point = points[mid]
+            dx, dy, dz = center[0] - point[0], center[1] - point[1], center[2] - point[2]
+            if dx * dx + dy * dy + dz * dz <= limit:
+                found.append(point[3])
+            offset = center[axis] - point[axis]
+            if offset <= radius:
+                stack.append((lo, mid, (axis + 1) % 3))
+            if offset >= -radius:
+                stack.append((mid + 1, hi, (axis + 1) % 3))
+        return found
+
+    # (row id, distance) of the point closest to center. the half center is in is searched first, the other half
+    # only if it could hold something closer than the best so far
+    def nearest(self, center):
+        best, best_distance = None, math.inf
+        points = self.points
+        stack = [(0, len(points), 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            point = points[mid]
+            dx, dy, dz = center[0] - point[0], center[1] - point[1], center[2] - point[2]
+            distance = dx * dx + dy * dy + dz * dz
+            if distance < best_distance:
+                best, best_distance = point[3], distance
+            offset = center[axis] - point[axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if offset <= 0 else ((mid + 1, hi), (lo, mid))
+            if offset * offset < best_distance:
+                stack.append(far + ((axis + 1) % 3,))
+            stack.append(near + ((axis + 1) % 3,))
+        return best, math.sqrt(best_distance)
+
+
+# trailhead locations as unit vectors in x, y, z columns (NaN without coordinates) with a k-d tree over them, built
+# on the first radius search. rows added, moved or deleted after the build are checked one by one instead of being
+# trusted from the tree, until there are enough of them that rebuilding is cheaper
+class GeoIndex:
+
+    rebuild_ratio = 0.05
+
+    def __init__(self, rows):
+        vectors = [unit_vector(row.lat, row.lon) if row.lat is not None else (math.nan,) * 3 for row in rows]
+        self.x = array("d", [vector[0] for vector in vectors])
+        self.y = array("d", [vector[1] for vector in vectors])
+        self.z = array("d", [vector[2] for vector in vectors])
+        self.tree = None
+        self.recent = set()  # row ids the tree is out of date for
+
+    # set a row's location, appending if it is a new row
+    def set(self, row_id, lat, lon):
+        vector = unit_vector(lat, lon) if lat is not None else (math.nan,) * 3
+        if row_id == len(self.x):
+            self.x.append(vector[0])
+            self.y.append(vector[1])
+            self.z.append(vector[2])
+        else:
+            self.x[row_id], self.y[row_id], self.z[row_id] = vector
+        if self.tree is not None:
+            self.recent.add(row_id)
+
+    def remove(self, row_id):
+        self.set(row_id, None, None)
+
+    # great-circle km from a unit vector to every row in one pass, inf for rows without coordinates
+    def distances(self, center):
+        cx, cy, cz = center
+        return array("d", [chord_km(math.sqrt((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2)) if x == x else math.inf
+                           for x, y, z in zip(self.x, self.y, self.z)])
+
+    def distance(self, row_id, center):
+        x, y, z = self.x[row_id], self.y[row_id], self.z[row_id]
+        if x != x:
+            return math.inf
+        return chord_km(math.sqrt((x - center[0]) ** 2 + (y - center[1]) ** 2 + (z - center[2]) ** 2))
+
+    # row ids within km of a unit vector, unordered
+    def within(self, center, km):
+        if self.tree is None or len(self.recent) > len(self.x) * self.rebuild_ratio:
+            self.tree = KDTree((x, y, z, row_id) for row_id, (x, y, z) in enumerate(zip(self.x, self.y, self.z))
+                               if x == x)
+            self.recent.clear()
+        radius = chord_length(km)
+        found = self.tree.within(center, radius)
+        if self.recent:
+            found = [row_id for row_id in found if row_id not in self.recent]
+            limit = radius * radius
+            for row_id in self.recent:
+                dx, dy, dz = self.x[row_id] - center[0], self.y[row_id] - center[1], self.z[row_id] - center[2]
+                if dx * dx + dy * dy + dz * dz <= limit:
+                    found.append(row_id)
+        return found
+
+
+# the radius filter as a range index over km_from_home for the query planner: only "within high km" ranges can use
+# it. the last lookup is remembered since planning and searching ask for the same radius back to back
+class RadiusIndex:
+
+    def __init__(self, index):
+        self.index = index
+        self.last = None  # (radius, index version, row ids)
+
+    def lookup(self, low, high):
+        key = (high, self.index.version)
+        if self.last is None or self.last[:2] != key:
+            self.last = key + (self.index.geo.within(self.index.home_vector, high),)
+        return list(self.last[2])
+
+    def count(self, low, high):
+        self.lookup(low, high)
+        return len(self.last[2])
+
+
+# columnar index over the hikes table. Hike fields are loaded once into typed arrays, each search filter produces a
+# bitset and the bitsets are intersected, so a search never copies or mutates the hike list. results are row ids,
+# i.e. positions in self.rows
+class HikeIndex:
+
+    # column name: array typecode. columns are named after the Hike field they hold
+    columns = {
+        "distance": "d",
+        "elev_gain": "d",
+        "max_elev": "d",
+        "prominence": "d",
+        "difficulty_score": "d",
+        "hours_from_home": "d",
+        "complete": "b",
+    }
+
+    # Hike text fields that tables sort on case-insensitively
+    text_fields = ("name", "area")
+
+    # table column: typed column or text field it sorts on
+    sort_columns = {
+        "complete": "complete",
+        "name": "name",
+        "total_distance": "distance",
+        "elev_gain": "elev_gain",
+        "max_elev": "max_elev",
+        "prominence": "prominence",
+        "diff_rating": "difficulty_score",
+        "gen_area": "area",
+        "dist_from_home": "km_from_home",
+    }
+
+    # columns with a sorted secondary index for the greater than / less than search inputs
+    indexed_columns = ("distance", "elev_gain", "max_elev", "difficulty_score")
+
+    # use the sorted indexes when the most selective predicate matches at most this share of the catalog,
+    # past that a full bitset scan is cheaper than walking candidates one by one
+    index_scan_ratio = 0.25
+
+    def __init__(self, rows, home=DEFAULT_HOME):
+        self.rows = list(rows)  # Hike records
+        self.data = {}
+        for name, typecode in self.columns.items():
+            self.data[name] = array(typecode, map(attrgetter(name), self.rows))
+        # trailhead locations, and great-circle km from home as a derived column
+        self.geo = GeoIndex(self.rows)
+        self.home = home
+        self.home_vector = unit_vector(*home)
+        self.data["km_from_home"] = self.geo.distances(self.home_vector)
+        self.radius_index = RadiusIndex(self)
+        # hike id -> routed drive hours from home, in place of the static hours column
+        self.drive_times = {}
+        # keyword postings are left to text_index.build, so the catalog can be shown before they exist
+        self.text_index = TextIndex(TextIndex.text(row.name, row.area, row.keywords) for row in self.rows)
+        self.all_mask = (1 << len(self.rows)) - 1
+        self.indexes = {name: SortedIndex(self.data[name]) for name in self.indexed_columns}
+        # primary key -> row id
+        self.by_id = {row.id: row_id for row_id, row in enumerate(self.rows)}
+        # row ids of deleted rows, which keep their place in rows so ids held elsewhere stay valid
+        self.deleted = set()
+        # bumped on every change so cached search results can tell they are stale
+        self.version = 0
+        # table column -> (ascending row ids, position of each row id in that order)
+        self.sort_cache = {}
+        # row id -> formatted treeview values, filled as rows are first shown
+        self.display_cache = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    # a row's value for a typed column
+    def column_value(self, row, name):
+        if name == "hours_from_home":
+            return self.drive_times.get(row.id, row.hours_from_home)
+        return getattr(row, name)
+
+    # add a new row, returns its row id
+    def append(self, row):
+        row_id = len(self.rows)
+        self.rows.append(row)
+        for name in self.columns:
+            self.data[name].append(self.column_value(row, name))
+        self.geo.set(row_id, row.lat, row.lon)
+        self.data["km_from_home"].append(self.geo.distance(row_id, self.home_vector))
+        self.text_index.add(row_id, row.name, row.area, row.keywords)
+        self.all_mask |= 1 << row_id
+        self.by_id[row.id] = row_id
+        for name, index in self.indexes.items():
+            index.insert(self.data[name][row_id], row_id)
+        self.sort_cache.clear()
+        self.version += 1
+        return row_id
+
+    # replace the row at row_id, only indexes whose value changed are touched
+    def update(self, row_id, row):
+        old_row = self.rows[row_id]
+        self.rows[row_id] = row
+        self.display_cache.pop(row_id, None)
+        for name in self.columns:
+            old, new = self.data[name][row_id], self.column_value(row, name)
+            if old != new:
+                self.data[name][row_id] = new
+                self.drop_sort_cache(name)
+                if name in self.indexes:
+                    self.indexes[name].remove(old, row_id)
+                    self.indexes[name].insert(new, row_id)
+        for field in self.text_fields:
+            if getattr(old_row, field) != getattr(row, field):
+                self.drop_sort_cache(field)
+        if (old_row.lat, old_row.lon) != (row.lat, row.lon):
+            self.geo.set(row_id, row.lat, row.lon)
+            self.data["km_from_home"][row_id] = self.geo.distance(row_id, self.home_vector)
+            self.drop_sort_cache("km_from_home")
+        self.text_index.update(row_id, row.name, row.area, row.keywords)
+        self.version += 1
+
+    # tombstone a deleted row: it drops out of every index, search and sort order
+    def remove(self, row_id):
+        del self.by_id[self.rows[row_id].id]
+        self.deleted.add(row_id)
+        self.all_mask &= ~(1 << row_id)
+        self.display_cache.pop(row_id, None)
+        self.text_index.remove(row_id)
+        for name, index in self.indexes.items():
+            index.remove(self.data[name][row_id], row_id)
+        self.geo.remove(row_id)
+        self.sort_cache.clear()
+        self.version += 1
+
+    # measure distances from a new home location, one pass over the trailheads. drive times from the old home no
+    # longer apply, so hours from home fall back to the static column until new ones are routed
+    def set_home(self, home):
+        self.home = home
+        self.home_vector = unit_vector(*home)
+        self.data["km_from_home"] = self.geo.distances(self.home_vector)
+        self.drop_sort_cache("km_from_home")
+        self.set_drive_times({})
+
+    # use routed drive hours per hike id (None where no road reaches) for the hours from home column
+    def set_drive_times(self, times):
+        self.drive_times = {hike_id: hours for hike_id, hours in times.items() if hours is not None}
+        hours = self.data["hours_from_home"]
+        for row_id, row in enumerate(self.rows):
+            hours[row_id] = self.drive_times.get(row.id, row.hours_from_home)
+        self.drop_sort_cache("hours_from_home")
+        self.display_cache.clear()
+        self.version += 1
+
+    # row ids of every row that hasn't been deleted, in catalog order
+    def live_ids(self):
+        if self.deleted:
+            return mask_ids(self.all_mask)
+        return range(len(self.rows))
+
+    # apply hikes changed in the database and the primary keys of deleted ones, returns the (added, updated, removed)
+    # row ids. only the touched rows are re-indexed
+    def sync(self, rows, deleted_ids):
+        added, updated, removed = [], [], []
+        for hike_id in deleted_ids:
+            row_id = self.by_id.get(hike_id)
+            if row_id is not None:
+                self.remove(row_id)
+                removed.append(row_id)
+        for row in rows:
+            row_id = self.by_id.get(row.id)
+            if row_id is None:
+                added.append(self.append(row))
+            elif self.rows[row_id] != row:
+                self.update(row_id, row)
+                updated.append(row_id)
+        return added, updated, removed
+
+    # forget the cached order of every table column sorted on source
+    def drop_sort_cache(self, source):
+        for column, column_source in self.sort_columns.items():
+            if column_source == source:
+                self.sort_cache.pop(column, None)
+
+    # ascending order of all rows by a table column, computed once and cached until that column changes
+    def sort_permutation(self, column):
+        if column not in self.sort_cache:
+            source = self.sort_columns[column]
+            if source in self.text_fields:
+                keys = [getattr(row, source).lower() for row in self.rows]
+            else:
+                keys = self.data[source]
+            order = sorted(self.live_ids(), key=keys.__getitem__)
+            positions = array("l", bytes(array("l").itemsize * len(self.rows)))
+            for pos, row_id in enumerate(order):
+                positions[row_id] = pos
+            self.sort_cache[column] = (order, positions)
+        return self.sort_cache[column]
+
+    # order row_ids by a table column's typed value. sorting every row reads the cached permutation directly, a
+    # subset is sorted by its positions in it, and descending is the ascending order read backwards
+    def sort_rows(self, column, row_ids, reverse=False):
+        order, positions = self.sort_permutation(column)
+        if len(row_ids) == len(order):
+            row_ids = list(order)
+        else:
+            row_ids = sorted(row_ids, key=positions.__getitem__)
+        if reverse:
+            row_ids.reverse()
+        return row_ids
+
+    # treeview values for a row, formatted once and reused until the row changes
+    def display_row(self, row_id):
+        values = self.display_cache.get(row_id)
+        if values is None:
+            row = self.rows[row_id]
+            values = self.display_cache[row_id] = hike_values(row, self.data["km_from_home"][row_id],
+                                                              self.drive_times.get(row.id))
+        return values
+
+    # row for a primary key, or None
+    def get(self, hike_id):
+        row_id = self.by_id.get(hike_id)
+        return None if row_id is None else self.rows[row_id]
+
+    # add or refresh a hike fetched from the database, returns its row id
+    def upsert(self, row):
+        row_id = self.by_id.get(row.id)
+        if row_id is None:
+            return self.append(row)
+        if self.rows[row_id] != row:
+            self.update(row_id, row)
+        return row_id
+
+    def range_mask(self, column, low, high):
+        values = self.data[column]
+        if low is None:
+            return to_mask([value <= high for value in values])
+        if high is None:
+            return to_mask([low <= value for value in values])
+        return to_mask([low <= value <= high for value in values])
+
+    # query planner: split the query's ranges into indexed predicates, ordered by estimated match count (exact,
+    # from the sorted index bounds), and residual predicates that have to be checked row by row
+    def plan(self, query):
+        indexed = []
+        residual = []
+        for column, low, high in query.ranges:
+            index = self.range_index(column, low)
+            if index:
+                indexed.append((index.count(low, high), column, low, high))
+            else:
+                residual.append((column, low, high))
+        indexed.sort(key=lambda predicate: predicate[0])
+        return indexed, residual
+
+    # index that can look up a range of a column, or None if the range has to be checked row by row
+    def range_index(self, column, low):
+        if column == "km_from_home":
+            return self.radius_index if low is None else None
+        return self.indexes.get(column)
+
+    # true if the row passes every filter in the query
+    def matches(self, row_id, query):
+        if query.keyword and query.keyword not in self.text_index.texts[row_id]:
+            return False
+        for column, low, high in query.ranges:
+            if not in_range(self.data[column][row_id], low, high):
+                return False
+        return True
+
+    # order matched row ids the way search returns them
+    def rank(self, row_ids, keyword):
+        if keyword:
+            return self.text_index.rank(sorted(row_ids), keyword)
+        return sorted(row_ids)
+
+    # rows an incremental search has to check: keyword matches, else the most selective index range, else all rows
+    def candidates(self, query):
+        if query.keyword:
+            return self.text_index.search(query.keyword)
+        indexed, residual = self.plan(query)
+        if indexed:
+            estimate, column, low, high = indexed[0]
+            return self.range_index(column, low).lookup(low, high)
+        return self.live_ids()
+
+    # run every filter in the query and return the matching row ids, best keyword matches first or in catalog
+    # order when there is no keyword
+    def search(self, query):
+        if query.keyword:
+            return self.keyword_search(query)
+        with profiler.span("search.plan"):
+            indexed, residual = self.plan(query)
+        if indexed and indexed[0][0] <= len(self.rows) * self.index_scan_ratio:
+            return self.index_search(query, indexed, residual)
+        return self.scan_search(query)
+
+    # start from the candidates of the most selective index and narrow them with the remaining predicates,
+    # O(log n + k) for the lookup plus O(k) per extra predicate
+    def index_search(self, query, indexed, residual):
+        estimate, column, low, high = indexed[0]
+        with profiler.span("search.lookup", column=column):
+            candidates = self.range_index(column, low).lookup(low, high)
+        for estimate, column, low, high in indexed[1:] + [(None,) + predicate for predicate in residual]:
+            values = self.data[column]
+            with profiler.span("search.filter", column=column, rows=len(candidates)):
+                candidates = [i for i in candidates if in_range(values[i], low, high)]
+        candidates.sort()
+        return candidates
+
+    # keyword matches from the text index are already ranked, narrow them with the range predicates in place
+    def keyword_search(self, query):
+        with profiler.span("search.keyword"):
+            candidates = self.text_index.search(query.keyword)
+        for column, low, high in query.ranges:
+            values = self.data[column]
+            with profiler.span("search.filter", column=column, rows=len(candidates)):
+                candidates = [i for i in candidates if in_range(values[i], low, high)]
+        return candidates
+
+    def scan_search(self, query):
+        mask = self.all_mask
+        for column, low, high in query.ranges:
+            if not mask:
+                break
+            with profiler.span("search.scan", column=column):
+                mask &= self.range_mask(column, low, high)
+        return mask_ids(mask)
+
+
+# empty until the background loader hands over the real index
+hike_index = HikeIndex([])
+
+
+# lru cache of recent query -> row ids. entries are only valid for the index version they were computed against, so
+# any change to the catalog clears the cache
+class SearchCache:
+
+    def __init__(self, index, capacity=64):
+        self.index = index
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.version = index.version
+
+    def check_version(self):
+        if self.version != self.index.version:
+            self.entries.clear()
+            self.version = self.index.version
+
+    def get(self, query):
+        self.check_version()
+        row_ids = self.entries.get(query)
+        if row_ids is not None:
+            self.entries.move_to_end(query)
+        return row_ids
+
+    def put(self, query, row_ids):
+        self.check_version()
+        self.entries[query] = tuple(row_ids)
+        self.entries.move_to_end(query)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    # smallest cached result that query only narrows, or None
+    def closest(self, query):
+        self.check_version()
+        best = None
+        for cached_query, row_ids in self.entries.items():
+            if refines(query, cached_query) and (best is None or len(row_ids) < len(best)):
+                best = row_ids
+        return best
+
+
+search_cache = SearchCache(hike_index)
+
+# live search waits this many ms after the last change before starting
+LIVE_SEARCH_DELAY = 150
+
+# searches run on a worker thread that posts matches this many rows at a time, and the ui collects them every this
+# many ms
+SEARCH_CHUNK = 2000
+SEARCH_POLL_INTERVAL = 30
+
+# times a search over the in-memory index starts over when a sync changes the index under it, after which it
+# finishes with what it found
+SEARCH_RETRIES = 3
+
+
+# hikes table columns, in the order rows are selected
+HIKE_COLUMNS = ("id", "name", "total_distance", "elev_gain", "max_elev", "prominence", "diff_rating", "gen_area",
+                "dist_from_home", "complete", "my_hike", "keywords", "trailhead_lat", "trailhead_lon")
+
+# the columns an import may change on an existing hike, everything but the key and the user's own flags
+CATALOG_COLUMNS = tuple(name for name in HIKE_COLUMNS if name not in ("id", "complete", "my_hike"))
+
+# columns written along with HIKE_COLUMNS: the indexed difficulty score and the formula version that computed it
+SCORE_COLUMNS = ("difficulty_score", "difficulty_version")
+
+# hikes table columns for each HikeIndex search column
+SQL_COLUMNS = {
+    "distance": "total_distance",
+    "elev_gain": "elev_gain",
+    "max_elev": "max_elev",
+    "prominence": "prominence",
+    "difficulty_score": "difficulty_score",
+    "complete": "complete",
+}
+
+
+# escape LIKE wildcards in user input
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# rows in HIKE_COLUMNS order with SCORE_COLUMNS appended
+def scored_rows(rows):
+    scores = difficulty_scores([row[2] for row in rows], [row[3] for row in rows], [row[4] for row in rows])
+    return [tuple(row) + (score, DIFFICULTY_VERSION) for row, score in zip(rows, scores)]
+
+
+# true if every filter in the query has an SQL form. distance and drive time from home depend on the user's home
+# location, so only the in-memory index can filter on them
+def can_push_down(query):
+    return all(column in SQL_COLUMNS for column, low, high in query.ranges)
+
+
+# turn a HikeQuery into one parameterized SELECT so the filtering happens in the database. placeholder and
+# like_escape cover the differences between the MySQL and SQLite dialects
+def build_search_sql(query, placeholder="%s", like_escape=""):
+    clauses = []
+    params = []
+    if query.keyword:
+        like = "LIKE " + placeholder + like_escape
+        clauses.append("(LOWER(name) " + like + " OR LOWER(gen_area) " + like + " OR LOWER(keywords) " + like + ")")
+        params += ["%" + escape_like(query.keyword) + "%"] * 3
+    for column, low, high in query.ranges:
+        if low is not None:
+            clauses.append(SQL_COLUMNS[column] + " >= " + placeholder)
+            params.append(low)
+        if high is not None:
+            clauses.append(SQL_COLUMNS[column] + " <= " + placeholder)
+            params.append(high)
+
+    sql = "SELECT " + ", ".join(HIKE_COLUMNS) + " FROM hikes"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql + " ORDER BY id", params
+
+
+# call fn until it stops raising mysql errors, sleeping delay, 2 * delay, ... seconds in between
+def with_backoff(fn, retries=DB_RETRIES, delay=DB_RETRY_DELAY):
+    for attempt in range(retries):
+        try:
+            return fn()
+        except mysql.connector.Error:
+            if attempt == retries - 1:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+# connection manager for the hikes database. each thread borrows its own pooled connection for the length of a
+# `with database.connection()` block, so the loader, searches and the write-behind queue can all run at once without
+# sharing a cursor. a connection is pinged (and reconnected if the server dropped it) every time it is handed out
+class Database:
+
+    def __init__(self, config, pool_size=DB_POOL_SIZE):
+        self.config = config
+        self.pool_size = pool_size
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def get_pool(self, retries):
+        with self.lock:
+            if self.pool is None:
+                self.pool = with_backoff(lambda: mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name="summit_register",
+                    pool_size=self.pool_size,
+                    **self.config
+                ), retries)
+            return self.pool
+
+    # wait for a free connection, the pool raises straight away when they are all in use
+    def checkout(self, retries):
+        pool = self.get_pool(retries)
+        deadline = time.monotonic() + DB_POOL_TIMEOUT
+        while True:
+            try:
+                return pool.get_connection()
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    # lower retries for calls the user is waiting on
+    @contextmanager
+    def connection(self, retries=DB_RETRIES):
+        connection = self.checkout(retries)
+        try:
+            with_backoff(lambda: connection.ping(reconnect=True), retries)
+            yield connection
+        except mysql.connector.Error:
+            try:
+                connection.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            connection.close()  # back to the pool
+
+
+# raised by every storage backend in place of its driver's own errors
+class StorageError(Exception):
+    pass
+
+
+# turn a driver's errors into StorageError
+@contextmanager
+def storage_errors(*error_types):
+    try:
+        yield
+    except error_types as e:
+        raise StorageError(str(e)) from e
+
+
+# storage interface the app talks to. rows are tuples in hikes table column order (HIKE_COLUMNS)
+class Storage:
+
+    # true if save_edits and write_hikes are unavailable
+    read_only = False
+
+    # bring the schema and difficulty scores up to date, called once before loading
+    def prepare(self):
+        pass
+
+    def count(self):
+        raise NotImplementedError
+
+    # yield every hike in lists of up to batch_size rows
+    def iter_hikes(self, batch_size):
+        raise NotImplementedError
+
+    # hike id -> notes
+    def load_notes(self):
+        raise NotImplementedError
+
+    # rows matching a HikeQuery, or None if the backend leaves searching to the in-memory index
+    def search(self, query):
+        return None
+
+    # latest change time in the catalog, or None if the backend doesn't track changes
+    def high_water(self):
+        return None
+
+    # (rows inserted or updated, primary keys deleted) at or after high_water
+    def changed_since(self, high_water):
+        raise NotImplementedError
+
+    # write {hike id: (notes, complete)} in one transaction. notes of None leave the stored notes as they are
+    def save_edits(self, edits):
+        raise NotImplementedError
+
+    # replace the catalog with rows
+    def write_hikes(self, rows):
+        raise NotImplementedError
 
-# master list of hikes
-hike_list = []
+    # largest hike id, 0 for an empty catalog
+    def max_id(self):
+        raise NotImplementedError
 
-# connection to hikes database
-try:
-    hiking_db = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="***********",
-        database="hikes"
+    # (id, name, gen_area, trailhead_lat, trailhead_lon) of the hikes with one of names, for matching imported
+    # records without an id to the hikes an earlier import created
+    def hikes_named(self, names):
+        raise NotImplementedError
+
+    # insert rows in one transaction. a row whose id is already in the catalog updates it, except for the user's own
+    # complete and my hike flags
+    def upsert_hikes(self, rows):
+        raise NotImplementedError
+
+    # write (miles, gain ft, high point ft, hike id) measured from tracks in one transaction. gain and high point are
+    # None for tracks without elevations, which leaves those columns as they were
+    def save_track_stats(self, stats):
+        raise NotImplementedError
+
+    # score the rows whose difficulty score is missing, e.g. rows added outside the app, or was computed by an older
+    # formula version. returns how many were scored
+    def refresh_difficulty_scores(self):
+        return 0
+
+
+# the hikes database on a MySQL server
+class MySQLStorage(Storage):
+
+    # deletes are recorded by a trigger into hike_deletions, since a deleted row has no updated_at left to compare
+    change_log = (
+        "CREATE TABLE IF NOT EXISTS hike_deletions (hike_id INT PRIMARY KEY, "
+        "deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, INDEX (deleted_at))",
+        "CREATE TRIGGER IF NOT EXISTS hikes_log_delete AFTER DELETE ON hikes FOR EACH ROW "
+        "INSERT INTO hike_deletions (hike_id) VALUES (OLD.id) ON DUPLICATE KEY UPDATE deleted_at = CURRENT_TIMESTAMP",
+    )
+
+    # (name, definition, indexed) for columns added to hikes since the original schema. updated_at is what the
+    # high water mark and delta sync compare against
+    added_columns = (("trailhead_lat", "DOUBLE NULL", False), ("trailhead_lon", "DOUBLE NULL", False),
+                     ("difficulty_score", "DOUBLE NULL", True), ("difficulty_version", "INT NULL", False),
+                     ("updated_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP", True))
+
+    def __init__(self, config):
+        self.database = Database(config)
+        self.change_log_ready = False
+
+    def prepare(self):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT column_name, column_type, is_nullable FROM information_schema.columns "
+                           "WHERE table_schema = DATABASE() AND table_name = 'hikes'")
+            existing = {name.lower(): (column_type, nullable) for name, column_type, nullable in cursor.fetchall()}
+            # hikes imported without a trailhead have no hours from home
+            column_type, nullable = existing.get("dist_from_home", (None, "YES"))
+            if nullable == "NO":
+                cursor.execute("ALTER TABLE hikes MODIFY dist_from_home " + column_type + " NULL")
+            for name, sql_type, indexed in self.added_columns:
+                if name not in existing:
+                    cursor.execute("ALTER TABLE hikes ADD COLUMN " + name + " " + sql_type)
+                    if indexed:
+                        cursor.execute("CREATE INDEX hikes_" + name + " ON hikes (" + name + ")")
+            # imports look hikes up by name
+            cursor.execute("SELECT index_name FROM information_schema.statistics "
+                           "WHERE table_schema = DATABASE() AND table_name = 'hikes' AND index_name = 'hikes_name'")
+            if not cursor.fetchall():
+                cursor.execute("CREATE INDEX hikes_name ON hikes (name)")
+            try:
+                for statement in self.change_log:
+                    cursor.execute(statement)
+                self.change_log_ready = True
+            except mysql.connector.Error:
+                # e.g. no TRIGGER privilege: deletes can't be seen, so high_water() opts out and every start reads
+                # the whole catalog
+                self.change_log_ready = False
+            cursor.close()
+        self.refresh_difficulty_scores()
+
+    # the connector only batches INSERTs, so the updates go out in IMPORT_BATCH_SIZE transactions. this is a
+    # one-off after a formula change
+    def refresh_difficulty_scores(self):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT id, total_distance, elev_gain, max_elev FROM hikes "
+                           "WHERE difficulty_version IS NULL OR difficulty_version <> %s", (DIFFICULTY_VERSION,))
+            stale = cursor.fetchall()
+            scores = difficulty_scores([row[1] for row in stale], [row[2] for row in stale], [row[3] for row in stale])
+            updates = [(score, DIFFICULTY_VERSION, row[0]) for row, score in zip(stale, scores)]
+            for start in range(0, len(updates), IMPORT_BATCH_SIZE):
+                cursor.executemany("UPDATE hikes SET difficulty_score = %s, difficulty_version = %s WHERE id = %s",
+                                   updates[start:start + IMPORT_BATCH_SIZE])
+                connection.commit()
+            cursor.close()
+            return len(updates)
+
+    def count(self):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM hikes")
+            total = cursor.fetchone()[0]
+            cursor.close()
+            return total
+
+    def iter_hikes(self, batch_size):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT " + ", ".join(HIKE_COLUMNS) + " FROM hikes")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+            cursor.close()
+
+    # latest updated_at or deleted_at, kept as text so it round trips exactly. updated_at is an indexed TIMESTAMP ...
+    # ON UPDATE CURRENT_TIMESTAMP column, so this is two index lookups however big the catalog is
+    def high_water(self):
+        if not self.change_log_ready:
+            return None
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT CAST(GREATEST(COALESCE((SELECT MAX(updated_at) FROM hikes), '1970-01-01 00:00:01'), "
+                "COALESCE((SELECT MAX(deleted_at) FROM hike_deletions), '1970-01-01 00:00:01')) AS CHAR)"
+            )
+            latest = cursor.fetchone()[0]
+            cursor.close()
+            return latest
+
+    # timestamps only have whole second precision, so changes from the high water mark's own second are fetched again
+    def changed_since(self, high_water):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT " + ", ".join(HIKE_COLUMNS) + " FROM hikes WHERE updated_at >= %s", (high_water,))
+            rows = cursor.fetchall()
+            cursor.execute("SELECT hike_id FROM hike_deletions WHERE deleted_at >= %s", (high_water,))
+            deleted = [hike_id for (hike_id,) in cursor.fetchall()]
+            cursor.close()
+            return rows, deleted
+
+    def load_notes(self):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS hike_notes (hike_id INT PRIMARY KEY, notes TEXT NOT NULL)")
+            cursor.execute("SELECT hike_id, notes FROM hike_notes")
+            notes = dict(cursor.fetchall())
+            cursor.close()
+            return notes
+
+    # server-side prepared statement, one attempt since the user is waiting on it
+    def search(self, query):
+        sql, params = build_search_sql(query)
+        with storage_errors(mysql.connector.Error), self.database.connection(retries=1) as connection:
+            cursor = connection.cursor(prepared=True)
+            try:
+                cursor.execute(sql, params)
+                return [tuple(row) for row in cursor]
+            finally:
+                cursor.close()
+
+    def max_id(self):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM hikes")
+            largest = cursor.fetchone()[0]
+            cursor.close()
+            return largest
+
+    def hikes_named(self, names):
+        names = list(names)
+        if not names:
+            return []
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT id, name, gen_area, trailhead_lat, trailhead_lon FROM hikes WHERE name IN ("
+                           + ", ".join(["%s"] * len(names)) + ")", names)
+            found = cursor.fetchall()
+            cursor.close()
+            return found
+
+    # the connector rewrites executemany of an INSERT into a single multi-row statement, so a batch is one round trip
+    def upsert_hikes(self, rows):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            columns = HIKE_COLUMNS + SCORE_COLUMNS
+            cursor.executemany(
+                "INSERT INTO hikes (" + ", ".join(columns) + ") VALUES (" + ", ".join(["%s"] * len(columns))
+                + ") ON DUPLICATE KEY UPDATE "
+                + ", ".join(name + " = VALUES(" + name + ")" for name in CATALOG_COLUMNS + SCORE_COLUMNS),
+                scored_rows(rows)
+            )
+            connection.commit()
+            cursor.close()
+
+    def save_track_stats(self, stats):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                "UPDATE hikes SET total_distance = %s, elev_gain = COALESCE(%s, elev_gain), "
+                "max_elev = COALESCE(%s, max_elev), difficulty_version = NULL WHERE id = %s",
+                stats
+            )
+            connection.commit()
+            cursor.close()
+        self.refresh_difficulty_scores()
+
+    def save_edits(self, edits):
+        with storage_errors(mysql.connector.Error), self.database.connection() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                "UPDATE hikes SET complete = %s WHERE id = %s",
+                [(complete, hike_id) for hike_id, (notes, complete) in edits.items()]
+            )
+            cursor.executemany(
+                "INSERT INTO hike_notes (hike_id, notes) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE notes = VALUES(notes)",
+                [(hike_id, notes) for hike_id, (notes, complete) in edits.items() if notes is not None]
+            )
+            connection.commit()
+            cursor.close()
+
+
+# the same schema in a local SQLite file, for running offline. the filter columns Search uses are indexed, so
+# pushed-down searches are index lookups. sqlite connections can't cross threads, so each thread opens its own
+class SQLiteStorage(Storage):
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS hikes (id INTEGER PRIMARY KEY, name TEXT NOT NULL, total_distance REAL, "
+        "elev_gain INTEGER, max_elev INTEGER, prominence INTEGER, diff_rating TEXT, gen_area TEXT, "
+        "dist_from_home REAL, complete INTEGER, my_hike INTEGER, keywords TEXT, trailhead_lat REAL, "
+        "trailhead_lon REAL, difficulty_score REAL, difficulty_version INTEGER)",
+        "CREATE INDEX IF NOT EXISTS hikes_total_distance ON hikes (total_distance)",
+        "CREATE INDEX IF NOT EXISTS hikes_elev_gain ON hikes (elev_gain)",
+        "CREATE INDEX IF NOT EXISTS hikes_max_elev ON hikes (max_elev)",
+        "CREATE INDEX IF NOT EXISTS hikes_dist_from_home ON hikes (dist_from_home)",
+        "CREATE INDEX IF NOT EXISTS hikes_diff_rating ON hikes (diff_rating)",
+        "CREATE TABLE IF NOT EXISTS hike_notes (hike_id INTEGER PRIMARY KEY, notes TEXT NOT NULL)",
     )
-    cursor = hiking_db.cursor()
-    cursor.execute("SELECT * FROM hikes")
-    for hike in cursor:
-        hike_list.append(hike)
 
-except mysql.connector.Error:
-    print("Unable to connect to database. Check your connection and try again.")
-    quit()
+    # columns added to hikes since the first version of the schema, for files created before them, and indexes on
+    # them
+    added_columns = (("trailhead_lat", "REAL"), ("trailhead_lon", "REAL"), ("difficulty_score", "REAL"),
+                     ("difficulty_version", "INTEGER"))
+    added_indexes = ("CREATE INDEX IF NOT EXISTS hikes_difficulty_score ON hikes (difficulty_score)",
+                     "CREATE INDEX IF NOT EXISTS hikes_name ON hikes (name)")
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            with storage_errors(sqlite3.Error):
+                connection = sqlite3.connect(self.path)
+                for statement in self.schema:
+                    connection.execute(statement)
+                existing = {column[1] for column in connection.execute("PRAGMA table_info(hikes)")}
+                for name, sql_type in self.added_columns:
+                    if name not in existing:
+                        connection.execute("ALTER TABLE hikes ADD COLUMN " + name + " " + sql_type)
+                for statement in self.added_indexes:
+                    connection.execute(statement)
+                self.local.connection = connection
+        return self.local.connection
+
+    def prepare(self):
+        self.refresh_difficulty_scores()
+
+    def refresh_difficulty_scores(self):
+        with storage_errors(sqlite3.Error), self.connection() as connection:
+            stale = connection.execute("SELECT id, total_distance, elev_gain, max_elev FROM hikes "
+                                       "WHERE difficulty_version IS NULL OR difficulty_version <> ?",
+                                       (DIFFICULTY_VERSION,)).fetchall()
+            scores = difficulty_scores([row[1] for row in stale], [row[2] for row in stale], [row[3] for row in stale])
+            connection.executemany("UPDATE hikes SET difficulty_score = ?, difficulty_version = ? WHERE id = ?",
+                                   [(score, DIFFICULTY_VERSION, row[0]) for row, score in zip(stale, scores)])
+            return len(stale)
+
+    def count(self):
+        with storage_errors(sqlite3.Error):
+            return self.connection().execute("SELECT COUNT(*) FROM hikes").fetchone()[0]
+
+    def iter_hikes(self, batch_size):
+        with storage_errors(sqlite3.Error):
+            cursor = self.connection().execute("SELECT " + ", ".join(HIKE_COLUMNS) + " FROM hikes")
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+
+    def load_notes(self):
+        with storage_errors(sqlite3.Error):
+            return dict(self.connection().execute("SELECT hike_id, notes FROM hike_notes"))
+
+    def search(self, query):
+        sql, params = build_search_sql(query, placeholder="?", like_escape=" ESCAPE '\\'")
+        with storage_errors(sqlite3.Error):
+            return self.connection().execute(sql, params).fetchall()
+
+    def save_edits(self, edits):
+        with storage_errors(sqlite3.Error), self.connection() as connection:
+            connection.executemany(
+                "UPDATE hikes SET complete = ? WHERE id = ?",
+                [(complete, hike_id) for hike_id, (notes, complete) in edits.items()]
+            )
+            connection.executemany(
+                "INSERT INTO hike_notes (hike_id, notes) VALUES (?, ?) "
+                "ON CONFLICT (hike_id) DO UPDATE SET notes = excluded.notes",
+                [(hike_id, notes) for hike_id, (notes, complete) in edits.items() if notes is not None]
+            )
+
+    def write_hikes(self, rows):
+        with storage_errors(sqlite3.Error), self.connection() as connection:
+            connection.execute("DELETE FROM hikes")
+            columns = HIKE_COLUMNS + SCORE_COLUMNS
+            connection.executemany("INSERT INTO hikes (" + ", ".join(columns) + ") VALUES ("
+                                   + ", ".join(["?"] * len(columns)) + ")", scored_rows(rows))
+
+    def max_id(self):
+        with storage_errors(sqlite3.Error):
+            return self.connection().execute("SELECT COALESCE(MAX(id), 0) FROM hikes").fetchone()[0]
+
+    # older sqlite builds allow 999 parameters a statement
+    def hikes_named(self, names):
+        names = list(names)
+        found = []
+        with storage_errors(sqlite3.Error):
+            for start in range(0, len(names), 500):
+                chunk = names[start:start + 500]
+                found += self.connection().execute(
+                    "SELECT id, name, gen_area, trailhead_lat, trailhead_lon FROM hikes WHERE name IN ("
+                    + ", ".join(["?"] * len(chunk)) + ")", chunk).fetchall()
+        return found
+
+    def upsert_hikes(self, rows):
+        with storage_errors(sqlite3.Error), self.connection() as connection:
+            columns = HIKE_COLUMNS + SCORE_COLUMNS
+            connection.executemany(
+                "INSERT INTO hikes (" + ", ".join(columns) + ") VALUES (" + ", ".join(["?"] * len(columns))
+                + ") ON CONFLICT (id) DO UPDATE SET "
+                + ", ".join(name + " = excluded." + name for name in CATALOG_COLUMNS + SCORE_COLUMNS),
+                scored_rows(rows)
+            )
+
+    def save_track_stats(self, stats):
+        with storage_errors(sqlite3.Error), self.connection() as connection:
+            connection.executemany(
+                "UPDATE hikes SET total_distance = ?, elev_gain = COALESCE(?, elev_gain), "
+                "max_elev = COALESCE(?, max_elev), difficulty_version = NULL WHERE id = ?",
+                stats
+            )
+        self.refresh_difficulty_scores()
+
+
+# read-only catalog snapshot in a single file, opened with mmap so loading is a copy out of the page cache.
+# layout: header (magic, version, row count, the source's high water mark), one fixed-width array per numeric
+# column (NaN for NULL floats), then per text column an array of count + 1 uint32 offsets followed by the utf-8
+# string table they index. sections are 8-byte aligned
+class SnapshotStorage(Storage):
+
+    read_only = True
+    magic = b"SRSNAP"
+    version = 3
+    # header layout for each readable version. versions 1 and 2 predate the trailhead columns, so those snapshots
+    # are replaced by a fresh load
+    headers = {3: struct.Struct("<6sHI32s")}
+
+    # (row position, array typecode) for the numeric columns, and row positions of the text columns
+    numeric_columns = ((0, "q"), (2, "d"), (3, "q"), (4, "q"), (5, "q"), (8, "d"), (9, "b"), (10, "b"), (12, "d"),
+                       (13, "d"))
+    text_columns = (1, 6, 7, 11)
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = None  # row position -> memoryview, or (offsets, string table) for text columns
+        self.total = 0
+        self.latest = None
+
+    @staticmethod
+    def padding(size):
+        return b"\0" * (-size % 8)
+
+    def open(self):
+        if self.columns is not None:
+            return
+        with storage_errors(OSError, ValueError, struct.error):
+            with open(self.path, "rb") as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(self.map)
+            magic, version = struct.unpack_from("<6sH", view)
+            if magic != self.magic or version not in self.headers:
+                raise ValueError(self.path + " is not a readable hike snapshot")
+            header = self.headers[version]
+            fields = header.unpack_from(view)
+            self.total = fields[2]
+            self.latest = fields[3].rstrip(b"\0").decode("ascii")
+            offset = header.size + len(self.padding(header.size))
+            self.columns = {}
+            for pos, typecode in self.numeric_columns:
+                size = array(typecode).itemsize * self.total
+                self.columns[pos] = view[offset:offset + size].cast(typecode)
+                offset += size + len(self.padding(size))
+            for pos in self.text_columns:
+                size = 4 * (self.total + 1)
+                offsets = view[offset:offset + size].cast("I")
+                offset += size + len(self.padding(size))
+                self.columns[pos] = (offsets, view[offset:offset + offsets[-1]])
+                offset += offsets[-1] + len(self.padding(offsets[-1]))
+
+    # unmap the file once the views into it are dropped
+    def close(self):
+        if self.columns is not None:
+            self.columns = None
+            self.map.close()
+
+    def count(self):
+        self.open()
+        return self.total
+
+    # the high water mark of the catalog the snapshot was taken from
+    def high_water(self):
+        self.open()
+        return self.latest
+
+    def iter_hikes(self, batch_size):
+        self.open()
+        for start in range(0, self.total, batch_size):
+            end = min(start + batch_size, self.total)
+            fields = {}
+            for pos, typecode in self.numeric_columns:
+                fields[pos] = self.columns[pos][start:end].tolist()
+            for pos in self.text_columns:
+                offsets, strings = self.columns[pos]
+                bounds = offsets[start:end + 1].tolist()
+                chunk = bytes(strings[bounds[0]:bounds[-1]])
+                text = chunk.decode("utf-8")
+                if len(text) == len(chunk):
+                    # all ascii, so byte offsets are character offsets and the batch decodes in one call
+                    base = bounds[0]
+                    fields[pos] = [text[bounds[i] - base:bounds[i + 1] - base] for i in range(end - start)]
+                else:
+                    fields[pos] = [str(strings[bounds[i]:bounds[i + 1]], "utf-8") for i in range(end - start)]
+            yield list(zip(*[fields[pos] for pos in range(len(HIKE_COLUMNS))]))
+
+    def load_notes(self):
+        return {}
+
+    def save_edits(self, edits):
+        raise StorageError("snapshot catalogs are read-only")
+
+    def max_id(self):
+        self.open()
+        return max(self.columns[0], default=0)
+
+    def hikes_named(self, names):
+        raise StorageError("snapshot catalogs are read-only")
+
+    def upsert_hikes(self, rows):
+        raise StorageError("snapshot catalogs are read-only")
+
+    def save_track_stats(self, stats):
+        raise StorageError("snapshot catalogs are read-only")
+
+    # snapshots are written whole rather than opened for writing, to a temporary file that then replaces the old
+    # one so a reader never sees half a snapshot. NULLs are stored as nan in float columns and, as Hike.from_row
+    # reads them anyway, as 0 or "" in the rest
+    def write_hikes(self, rows, high_water=""):
+        header = self.headers[self.version]
+        with storage_errors(OSError, struct.error):
+            with open(self.path + ".tmp", "wb") as file:
+                file.write(header.pack(self.magic, self.version, len(rows), high_water.encode("ascii")))
+                file.write(self.padding(header.size))
+                for pos, typecode in self.numeric_columns:
+                    if typecode == "d":
+                        data = array(typecode, [math.nan if row[pos] is None else row[pos] for row in rows])
+                    else:
+                        data = array(typecode, [row[pos] or 0 for row in rows])
+                    data = data.tobytes()
+                    file.write(data + self.padding(len(data)))
+                for pos in self.text_columns:
+                    strings = [(row[pos] or "").encode("utf-8") for row in rows]
+                    offsets = array("I", [0])
+                    for string in strings:
+                        offsets.append(offsets[-1] + len(string))
+                    file.write(offsets.tobytes() + self.padding(4 * len(offsets)))
+                    file.write(b"".join(strings) + self.padding(offsets[-1]))
+            os.replace(self.path + ".tmp", self.path)
+
+
+# pick a backend: "mysql", a .snapshot file, or anything else is taken as a SQLite database path
+def open_storage(spec):
+    if spec == "mysql":
+        return MySQLStorage(DB_CONFIG)
+    if spec.endswith(".snapshot"):
+        return SnapshotStorage(spec)
+    return SQLiteStorage(spec)
+
+
+storage = open_storage("mysql")
+
+
+# settings saved between runs, {} if there are none yet
+def load_settings():
+    try:
+        with open(SETTINGS_FILE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(settings):
+    with open(SETTINGS_FILE, "w") as file:
+        json.dump(settings, file, indent=2)
+
+
+# (latitude, longitude) trailhead distances are measured from
+def home_location():
+    return tuple(load_settings().get("home", DEFAULT_HOME))
+
+
+# (tag without its namespace, element) for each element of an XML file as it finishes parsing. once the caller moves
+# past an element directly under the root it is dropped from the tree, so reading a huge file keeps memory flat.
+# deeper elements stay until their top-level ancestor is done
+def xml_elements(path):
+    parse = ElementTree.iterparse(path, events=("start", "end"))
+    event, root = next(parse)
+    depth = 1
+    for event, element in parse:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        yield element.tag.rpartition("}")[2], element
+        if depth == 1:
+            root.clear()
+
+
+# drivable road network from an OpenStreetMap XML extract, in compressed sparse row form: the roads leaving node i
+# go to targets[offsets[i]:offsets[i + 1]] and take hours[...] (same positions) to drive
+class RoadGraph:
+
+    # drivable highway types and the speed (km/h) assumed when a way has no usable maxspeed
+    speeds = {
+        "motorway": 105, "motorway_link": 60, "trunk": 90, "trunk_link": 50, "primary": 80, "primary_link": 50,
+        "secondary": 70, "secondary_link": 40, "tertiary": 60, "tertiary_link": 40, "unclassified": 50,
+        "residential": 40, "living_street": 15, "service": 20, "track": 15,
+    }
+
+    # the file is read twice: first for the drivable ways and the nodes they use, then for just those nodes'
+    # coordinates, so the millions of nodes an extract holds for buildings and paths never stay in memory
+    def __init__(self, path):
+        ways = []
+        used = set()
+        for tag, element in xml_elements(path):
+            if tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                if tags.get("highway") in self.speeds:
+                    refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                    ways.append((refs, self.way_speed(tags), self.way_direction(tags)))
+                    used.update(refs)
+
+        positions = {}  # osm node id -> graph node
+        self.lats = array("d")
+        self.lons = array("d")
+        for tag, element in xml_elements(path):
+            if tag == "node" and int(element.get("id")) in used:
+                positions[int(element.get("id"))] = len(self.lats)
+                self.lats.append(float(element.get("lat")))
+                self.lons.append(float(element.get("lon")))
+
+        edges = []  # (source, target, hours)
+        for refs, speed, direction in ways:
+            nodes = [positions[ref] for ref in refs if ref in positions]
+            for a, b in zip(nodes, nodes[1:]):
+                hours = haversine_km(self.lats[a], self.lons[a], self.lats[b], self.lons[b]) / speed
+                if direction >= 0:
+                    edges.append((a, b, hours))
+                if direction <= 0:
+                    edges.append((b, a, hours))
+        edges.sort()
+        self.offsets = array("l", [0] * (len(self.lats) + 1))
+        for source, target, hours in edges:
+            self.offsets[source + 1] += 1
+        for node in range(len(self.lats)):
+            self.offsets[node + 1] += self.offsets[node]
+        self.targets = array("l", [edge[1] for edge in edges])
+        self.hours = array("d", [edge[2] for edge in edges])
+        self.tree = KDTree(unit_vector(lat, lon) + (node,) for node, (lat, lon) in enumerate(zip(self.lats, self.lons)))
+
+    # km/h from a maxspeed tag such as "50" or "35 mph", else the default for the highway type
+    def way_speed(self, tags):
+        match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", tags.get("maxspeed", ""))
+        if match and float(match.group(1)) > 0:
+            return float(match.group(1)) * (KM_PER_MILE if match.group(2) else 1)
+        return self.speeds[tags["highway"]]
+
+    # 1 one way along the node order, -1 one way against it, 0 both ways
+    @staticmethod
+    def way_direction(tags):
+        oneway = tags.get("oneway")
+        if oneway == "-1":
+            return -1
+        if oneway in ("yes", "true", "1"):
+            return 1
+        if oneway is None and (tags["highway"] in ("motorway", "motorway_link")
+                               or tags.get("junction") == "roundabout"):
+            return 1
+        return 0
+
+    # (graph node nearest a location, km to it)
+    def snap(self, lat, lon):
+        node, chord = self.tree.nearest(unit_vector(lat, lon))
+        return node, chord_km(chord)
+
+    # drive hours from home to every (hike id, lat, lon) trailhead, None where no road reaches. one dijkstra from the
+    # home node settles all trailhead nodes at once, stopping as soon as the last one is reached
+    def drive_hours(self, home, trailheads):
+        source, source_km = self.snap(*home)
+        targets = {}  # graph node -> [(hike id, km from the road)]
+        for hike_id, lat, lon in trailheads:
+            node, km = self.snap(lat, lon)
+            targets.setdefault(node, []).append((hike_id, km))
+
+        hours = array("d", [math.inf]) * len(self.lats)
+        hours[source] = 0.0
+        heap = [(0.0, source)]
+        remaining = len(targets)
+        while heap and remaining:
+            time_to, node = heapq.heappop(heap)
+            if time_to > hours[node]:
+                continue
+            if node in targets:
+                remaining -= 1
+            for edge in range(self.offsets[node], self.offsets[node + 1]):
+                target, time_then = self.targets[edge], time_to + self.hours[edge]
+                if time_then < hours[target]:
+                    hours[target] = time_then
+                    heapq.heappush(heap, (time_then, target))
+
+        times = {}
+        for node, hikes in targets.items():
+            for hike_id, km in hikes:
+                if hours[node] == math.inf:
+                    times[hike_id] = None
+                else:
+                    times[hike_id] = hours[node] + (source_km + km) / ACCESS_SPEED
+        return times
+
+
+# drive times from a home location to every trailhead, cached per home in DRIVE_TIMES_FILE. the road graph is only
+# read when a home isn't cached yet, then kept for the rest of the session
+class DriveTimes:
+
+    def __init__(self, graph_path=ROAD_GRAPH_FILE, cache_path=DRIVE_TIMES_FILE):
+        self.graph_path = graph_path
+        self.cache_path = cache_path
+        self.graph = None
+        self.graph_stamp = None
+        self.lock = threading.Lock()
+
+    def available(self):
+        return os.path.exists(self.graph_path)
+
+    # home key -> {"graph": road file timestamp, "times": {hike id: hours}}, oldest first
+    def read_cache(self):
+        try:
+            with open(self.cache_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    # {hike id: hours or None} for (hike id, lat, lon) trailheads, routing only if the cache is missing some.
+    # runs on a background thread, None if the road graph can't be read
+    def compute(self, home, trailheads):
+        with self.lock:
+            try:
+                stamp = os.path.getmtime(self.graph_path)
+                key = "%.6f,%.6f" % home
+                cache = self.read_cache()
+                entry = cache.get(key)
+                if entry and entry["graph"] == stamp and all(str(hike_id) in entry["times"]
+                                                             for hike_id, lat, lon in trailheads):
+                    return {int(hike_id): hours for hike_id, hours in entry["times"].items()}
+
+                if self.graph is None or self.graph_stamp != stamp:
+                    self.graph = RoadGraph(self.graph_path)
+                    self.graph_stamp = stamp
+                times = self.graph.drive_hours(home, trailheads)
+
+                cache.pop(key, None)
+                cache[key] = {"graph": stamp, "times": {str(hike_id): hours for hike_id, hours in times.items()}}
+                while len(cache) > DRIVE_TIMES_HOMES:
+                    del cache[next(iter(cache))]
+                with open(self.cache_path, "w") as file:
+                    json.dump(cache, file)
+                return times
+
+            except (OSError, ElementTree.ParseError):
+                return None
+
+
+drive_times = DriveTimes()
+
+
+# runs on a background thread: post ("drive_times", home, {hike id: hours}) to messages once routed
+def route_trailheads(home, trailheads, messages):
+    times = drive_times.compute(home, trailheads)
+    if times is not None:
+        messages.put(("drive_times", home, times))
+
+
+# read a whole catalog in batches, posting ("progress", loaded, total) to messages as it goes
+def read_catalog(source, messages):
+    with profiler.span("load.read", source=type(source).__name__):
+        total = source.count()
+        rows = []
+        for batch in source.iter_hikes(LOAD_BATCH_SIZE):
+            rows += batch
+            messages.put(("progress", len(rows), total))
+        return rows
+
+
+# the rows and high water mark saved in CATALOG_SNAPSHOT, or (None, None) if there is no usable snapshot
+def read_snapshot(messages):
+    if not os.path.exists(CATALOG_SNAPSHOT):
+        return None, None
+    snapshot = SnapshotStorage(CATALOG_SNAPSHOT)
+    try:
+        rows = read_catalog(snapshot, messages)
+        return rows, snapshot.high_water()
+    except StorageError:
+        return None, None
+    finally:
+        snapshot.close()
+
+
+# merge changed rows into rows by primary key and drop deleted ones, returns how many rows were new, different or
+# deleted
+def apply_changes(rows, changes, deleted_ids=()):
+    changed = 0
+    deleted_ids = set(deleted_ids)
+    if deleted_ids:
+        kept = [row for row in rows if row[0] not in deleted_ids]
+        changed = len(rows) - len(kept)
+        rows[:] = kept
+    positions = {row[0]: pos for pos, row in enumerate(rows)}
+    for row in changes:
+        row = tuple(row)
+        pos = positions.get(row[0])
+        if pos is None:
+            positions[row[0]] = len(rows)
+            rows.append(row)
+        elif rows[pos] != row:
+            rows[pos] = row
+        else:
+            continue
+        changed += 1
+    return changed
+
+
+# runs on a background thread: read the catalog and build its index, posting progress, then ("loaded", index, notes or
+# None if they couldn't be read, high water mark) or ("error",) to messages for the tk event loop to pick up. when
+# storage tracks changes, the catalog comes from CATALOG_SNAPSHOT plus whatever changed since it was written, and the
+# snapshot is rewritten afterwards
+def load_catalog(messages):
+    home = home_location()
+    try:
+        with profiler.span("load.prepare"):
+            storage.prepare()
+            high_water = storage.high_water()
+    except StorageError:
+        high_water = None
+        # offline, a snapshot still gets the catalog on screen
+        rows = read_snapshot(messages)[0]
+        if rows is None:
+            messages.put(("error",))
+        else:
+            hikes = [Hike.from_row(row) for row in rows]
+            messages.put(("loaded", HikeIndex(hikes, home), None, None))
+        return
+
+    try:
+        if high_water is None:
+            rows = read_catalog(storage, messages)
+            changed = 0
+        else:
+            rows, snapshot_mark = read_snapshot(messages)
+            if rows is None or not snapshot_mark:
+                # read the mark first so anything changed while reading is fetched again next time
+                rows = read_catalog(storage, messages)
+                changed = len(rows)
+            else:
+                with profiler.span("load.changes"):
+                    changed = apply_changes(rows, *storage.changed_since(snapshot_mark))
+        with profiler.span("load.notes"):
+            notes = storage.load_notes()
+        with profiler.span("load.index", rows=len(rows)):
+            hikes = [Hike.from_row(row) for row in rows]
+            index = HikeIndex(hikes, home)
+        messages.put(("loaded", index, notes, high_water))
+
+    except StorageError:
+        messages.put(("error",))
+        return
+
+    if changed:
+        try:
+            SnapshotStorage(CATALOG_SNAPSHOT).write_hikes(rows, high_water)
+        except StorageError:
+            pass  # the next start reads the whole catalog again
+
+
+# copy the current catalog into another backend, e.g. a SQLite file or snapshot for offline use
+def export_catalog(target):
+    rows = []
+    for batch in storage.iter_hikes(LOAD_BATCH_SIZE):
+        rows += batch
+    target.write_hikes(rows)
+    print("Exported %d hikes" % len(rows))
+
+
+# raised when a trail file can't be imported at all, as opposed to single records failing validation
+class HikeImportError(Exception):
+    pass
+
+
+# hikes table column for a trail file field name: column names and Hike field names are both accepted
+IMPORT_FIELDS = dict(zip(HIKE_COLUMNS, HIKE_COLUMNS))
+IMPORT_FIELDS.update(zip(Hike.__slots__, HIKE_COLUMNS))
+
+
+# one track's points, collected as they're read and measured by analyze_track, so an imported track gets the same
+# smoothed distance, gain and high point as --analyze-tracks gives it. only one track is held at a time
+class TrackStats:
+
+    def __init__(self):
+        self.lats, self.lons, self.elevations = array("d"), array("d"), array("d")
+        self.ends = set()  # indexes where a new segment starts
+
+    # lat and lon in degrees, elevation in meters or None
+    def add(self, lat, lon, elevation=None):
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.elevations.append(math.nan if elevation is None else elevation)
+
+    # the next point starts a new segment, so the gap to it isn't walked
+    def break_segment(self):
+        self.ends.add(len(self.lats))
+
+    # import fields for what the track measured, in the hikes table's miles and feet
+    def fields(self):
+        if not self.lats:
+            return {}
+        analysis = analyze_track(self.lats, self.lons, self.elevations, self.ends)
+        fields = {"total_distance": round(analysis.km / KM_PER_MILE, 1), "trailhead_lat": self.lats[0],
+                  "trailhead_lon": self.lons[0]}
+        if analysis.highest is not None:
+            fields["elev_gain"] = round(analysis.gain * FEET_PER_METER)
+            fields["max_elev"] = round(analysis.highest * FEET_PER_METER)
+        return fields
+
+
+# (position, fields) for each row of a CSV file with a header row naming its columns
+def read_csv_records(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)
+        for record in reader:
+            fields = {}
+            for name, value in record.items():
+                column = IMPORT_FIELDS.get((name or "").strip().lower())
+                if column is not None:
+                    fields[column] = value.strip() if isinstance(value, str) else value
+            yield "line %d" % reader.line_num, fields
+
+
+# (position, fields) for each track or route of a GPX file, measured from its points
+def read_gpx_records(path):
+    position = 0
+    track, name = None, None
+    for tag, element in xml_elements(path):
+        if tag in ("trkpt", "rtept"):
+            if track is None:
+                track, name = TrackStats(), None
+            elevation = next((child.text for child in element if child.tag.rpartition("}")[2] == "ele"), None)
+            track.add(float(element.get("lat")), float(element.get("lon")),
+                      float(elevation) if elevation else None)
+            element.clear()
+        elif tag == "trkseg" and track is not None:
+            track.break_segment()
+            element.clear()
+        elif tag in ("trk", "rte"):
+            position += 1
+            fields = track.fields() if track is not None else {}
+            name = next((child.text for child in element if child.tag.rpartition("}")[2] == "name"), None)
+            fields["name"] = (name or "").strip()
+            yield "track %d" % position, fields
+            track = None
+
+
+# features of a GeoJSON FeatureCollection, decoded one at a time from a chunk of the file at a time. the read size
+# doubles while a feature doesn't fit, so a huge geometry still decodes in linear time
+def iter_geojson_features(file, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        match = re.search(r'"features"\s*:\s*\[', buffer)
+        if match:
+            break
+        more = file.read(chunk_size)
+        if not more:
+            raise ValueError("no features list")
+        buffer += more
+    buffer, pos = buffer[match.end():], 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos == len(buffer):
+                raise ValueError("features list cut short")
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            more = file.read(max(chunk_size, len(buffer) - pos))
+            if not more:
+                raise
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield feature
+
+
+# (position, fields) for each feature of a GeoJSON file: its properties, plus whatever a point or line geometry
+# measures that the properties leave out. coordinates are (lon, lat[, elevation in meters])
+def read_geojson_records(path):
+    with open(path, encoding="utf-8") as file:
+        for position, feature in enumerate(iter_geojson_features(file), 1):
+            fields = {}
+            for name, value in (feature.get("properties") or {}).items():
+                column = IMPORT_FIELDS.get(name.strip().lower())
+                if column is not None:
+                    fields[column] = value
+            geometry = feature.get("geometry") or {}
+            lines = {"Point": [[geometry.get("coordinates")]], "LineString": [geometry.get("coordinates")],
+                     "MultiLineString": geometry.get("coordinates")}.get(geometry.get("type"), [])
+            track = TrackStats()
+            for line in lines:
+                for point in line or ():
+                    track.add(point[1], point[0], point[2] if len(point) > 2 else None)
+                track.break_segment()
+            measured = track.fields()
+            if geometry.get("type") == "Point":
+                measured = {name: value for name, value in measured.items() if name.startswith("trailhead")}
+            for name, value in measured.items():
+                fields.setdefault(name, value)
+            yield "feature %d" % position, fields
+
+
+# trail file readers by extension
+TRAIL_FILE_READERS = {
+    ".csv": read_csv_records,
+    ".gpx": read_gpx_records,
+    ".geojson": read_geojson_records,
+    ".json": read_geojson_records,
+}
+
+
+# validate one imported record against the hikes schema and return it as a row, raising ValueError with the reason
+# if it doesn't fit. a record without an id has None for one, for import_hikes to fill in
+def import_row(fields):
+
+    def number(column, convert, default=None, low=0, high=math.inf):
+        value = fields.get(column)
+        if value is None or value == "":
+            if default is None:
+                raise ValueError("missing " + column)
+            return default
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("%s is not a number: %r" % (column, value)) from None
+        if not low <= number <= high:
+            raise ValueError("%s is out of range: %r" % (column, value))
+        if convert is int:
+            if number != int(number):
+                raise ValueError("%s is not a whole number: %r" % (column, value))
+            return int(number)
+        return number
+
+    def text(column, default=""):
+        value = fields.get(column)
+        return default if value is None else str(value).strip()
+
+    hike_id = number("id", int, default=0, low=1)
+    name = text("name")
+    if not name:
+        raise ValueError("missing name")
+    if len(name) > 255:
+        raise ValueError("name is longer than 255 characters")
+    distance = number("total_distance", float, high=1000)
+    elev_gain = number("elev_gain", int, default=0, high=100000)
+    max_elev = number("max_elev", int, default=0, low=-1500, high=30000)
+    lat = number("trailhead_lat", float, default=math.nan, low=-90, high=90)
+    lon = number("trailhead_lon", float, default=math.nan, low=-180, high=180)
+    if (lat != lat) != (lon != lon):
+        raise ValueError("trailhead needs both latitude and longitude")
+    if lat != lat:
+        lat = lon = None
+    hours = number("dist_from_home", float, default=math.nan, high=100)
+    if hours != hours:
+        # straight line at 60 km/h until routed, NULL without a trailhead to measure from
+        hours = None if lat is None else round(haversine_km(lat, lon, *DEFAULT_HOME) / 60, 1)
+    return (
+        hike_id or None,
+        name,
+        distance,
+        elev_gain,
+        max_elev,
+        number("prominence", int, default=0, high=30000),
+        text("diff_rating") or Difficulty.from_score(difficulty_score(distance, elev_gain, max_elev)).label,
+        sys.intern(text("gen_area")),
+        hours,
+        0,
+        0,
+        text("keywords"),
+        lat,
+        lon,
+    )
+
+
+# what identifies a hike imported without an id: its name, area and trailhead
+def natural_key(name, area, lat, lon):
+    return name, area, None if lat is None else round(lat, 5), None if lon is None else round(lon, 5)
+
+
+# give the rows of an import batch that have no id one: the id of the hike with the same natural key, whether an
+# earlier import or an earlier row of this one created it, or else next_id()
+def assign_import_ids(batch, next_id):
+    missing = [i for i, row in enumerate(batch) if row[0] is None]
+    if not missing:
+        return
+    known = {natural_key(*hike[1:]): hike[0] for hike in storage.hikes_named({batch[i][1] for i in missing})}
+    for i in missing:
+        row = batch[i]
+        key = natural_key(row[1], row[7], row[12], row[13])
+        if key not in known:
+            known[key] = next_id()
+        batch[i] = (known[key],) + row[1:]
+
+
+ImportResult = namedtuple("ImportResult", ["imported", "skipped", "errors", "seconds"])
+
+
+# stream a CSV, GPX or GeoJSON trail file into storage, IMPORT_BATCH_SIZE rows per transaction, so memory stays flat
+# however big the file is. records that fail validation are skipped and the first IMPORT_ERRORS_SHOWN reported, and
+# records without an id update the hike with their natural key if there is one. after each batch its Hike records
+# go to on_batch and progress(imported, skipped, seconds) is called
+def import_hikes(path, on_batch=None, progress=None):
+    reader = TRAIL_FILE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise HikeImportError("not a CSV, GPX or GeoJSON file: " + path)
+    if storage.read_only:
+        raise HikeImportError("the catalog is read-only")
+    next_id = count(storage.max_id() + 1)
+    started = time.perf_counter()
+    imported, skipped, errors = 0, 0, []
+
+    def valid_rows():
+        nonlocal skipped
+        for position, fields in reader(path):
+            try:
+                yield import_row(fields)
+            except ValueError as e:
+                skipped += 1
+                if len(errors) < IMPORT_ERRORS_SHOWN:
+                    errors.append("%s: %s" % (position, e))
+
+    rows = valid_rows()
+    try:
+        while True:
+            batch = list(islice(rows, IMPORT_BATCH_SIZE))
+            if not batch:
+                break
+            assign_import_ids(batch, next_id.__next__)
+            storage.upsert_hikes(batch)
+            imported += len(batch)
+            if on_batch is not None:
+                on_batch([Hike.from_row(row) for row in batch])
+            if progress is not None:
+                progress(imported, skipped, time.perf_counter() - started)
+    except (OSError, ValueError, SyntaxError, csv.Error) as e:  # SyntaxError covers ElementTree.ParseError
+        raise HikeImportError("%s after %d hikes: %s" % (os.path.basename(path), imported, e)) from e
+    return ImportResult(imported, skipped, errors, time.perf_counter() - started)
+
+
+# import a trail file from the command line, reporting throughput as it goes
+def import_catalog(path):
+    def progress(imported, skipped, seconds):
+        print("\r%d hikes imported, %d skipped, %.0f hikes/s" % (imported, skipped, imported / max(seconds, 1e-9)),
+              end="", flush=True)
+
+    storage.prepare()
+    result = import_hikes(path, progress=progress)
+    print("\rImported %d hikes in %.1f s (%.0f hikes/s), skipped %d"
+          % (result.imported, result.seconds, result.imported / max(result.seconds, 1e-9), result.skipped))
+    for error in result.errors:
+        print("  " + error)
+
+
+# runs on a background thread: post ("imported", hikes) after each batch is written, then ("import_done", result),
+# or ("import_failed", reason)
+def import_trail_file(path, messages):
+    try:
+        result = import_hikes(path, on_batch=lambda hikes: messages.put(("imported", hikes)))
+    except (HikeImportError, StorageError) as e:
+        messages.put(("import_failed", str(e)))
+        return
+    messages.put(("import_done", result))
+
+
+# (lats, lons, elevations, segment ends) for the track and route points of a GPX file in file order. elevations are
+# meters, NaN where a point has none, and segment ends are the indexes where a new segment starts, whose gap from
+# the point before isn't walked
+def read_track_points(path):
+    lats, lons, elevations = array("d"), array("d"), array("d")
+    ends = set()
+    for tag, element in xml_elements(path):
+        if tag in ("trkpt", "rtept"):
+            lats.append(float(element.get("lat")))
+            lons.append(float(element.get("lon")))
+            elevation = next((child.text for child in element if child.tag.rpartition("}")[2] == "ele"), None)
+            elevations.append(float(elevation) if elevation else math.nan)
+            element.clear()
+        elif tag in ("trkseg", "rte"):
+            ends.add(len(lats))
+            element.clear()
+    return lats, lons, elevations, ends
+
+
+# centered moving average of ys over a window of width along xs, which must be ascending. two pointers bracket the
+# window, so this is one pass however wide it is
+def moving_average(xs, ys, width):
+    smoothed = array("d")
+    lo = hi = 0
+    total = 0.0
+    for x in xs:
+        while hi < len(xs) and xs[hi] <= x + width / 2:
+            total += ys[hi]
+            hi += 1
+        while xs[lo] < x - width / 2:
+            total -= ys[lo]
+            lo += 1
+        smoothed.append(total / (hi - lo))
+    return smoothed
+
+
+# count (x, y) points evenly spaced along xs, interpolated from ys
+def resample(xs, ys, count):
+    if xs[-1] <= xs[0] or count < 2:
+        return [(xs[0], ys[0])]
+    points = []
+    j = 0
+    for k in range(count):
+        x = xs[0] + (xs[-1] - xs[0]) * k / (count - 1)
+        while j < len(xs) - 2 and xs[j + 1] < x:
+            j += 1
+        span = xs[j + 1] - xs[j]
+        t = (x - xs[j]) / span if span else 0.0
+        points.append((x, ys[j] + (ys[j + 1] - ys[j]) * t))
+    return points
+
+
+# km walked, smoothed climb (m), high point (m), steepest grade (%, up or down) and the elevation profile as
+# PROFILE_POINTS (km along the trail, m) pairs. all but km are None for a track without elevations
+TrackAnalysis = namedtuple("TrackAnalysis", ["km", "gain", "highest", "steepest", "profile"])
+
+
+def analyze_track(lats, lons, elevations, ends=()):
+    along = array("d", [0.0]) * len(lats)
+    for i in range(1, len(lats)):
+        step = 0.0 if i in ends else haversine_km(lats[i - 1], lons[i - 1], lats[i], lons[i])
+        along[i] = along[i - 1] + step
+    km = along[-1] if len(along) else 0.0
+
+    known = [i for i in range(len(elevations)) if elevations[i] == elevations[i]]
+    if not known:
+        return TrackAnalysis(km, None, None, None, None)
+    xs = array("d", [along[i] for i in known])
+    ys = array("d", [elevations[i] for i in known])
+    smoothed = moving_average(xs, ys, TRACK_SMOOTHING_M / 1000)
+    gain = 0.0
+    low = smoothed[0]  # lowest point since the last counted climb
+    for elevation in smoothed:
+        if elevation > low + TRACK_CLIMB_THRESHOLD_M:
+            gain += elevation - low
+            low = elevation
+        elif elevation < low:
+            low = elevation
+    profile = resample(xs, smoothed, PROFILE_POINTS)
+    steepest = 0.0
+    for (x1, y1), (x2, y2) in zip(profile, profile[1:]):
+        if x2 > x1:
+            steepest = max(steepest, abs(y2 - y1) / ((x2 - x1) * 1000) * 100)
+    return TrackAnalysis(km, gain, max(ys), steepest, profile)
+
+
+def track_path(hike_id):
+    return os.path.join(TRACKS_DIR, "%d.gpx" % hike_id)
+
+
+# analyze a <hike id>.gpx file and cache the result beside it, returns (hike id, TrackAnalysis or None, error or
+# None). runs in worker processes, so it only touches that track's own files
+def analyze_track_file(path):
+    hike_id = int(os.path.splitext(os.path.basename(path))[0])
+    try:
+        modified = os.path.getmtime(path)
+        analysis = analyze_track(*read_track_points(path))
+        cache = os.path.splitext(path)[0] + ".profile.json"
+        with open(cache + ".tmp", "w") as file:
+            json.dump({"track": modified, "analysis": analysis}, file)
+        os.replace(cache + ".tmp", cache)
+    except (OSError, ValueError, SyntaxError) as e:  # SyntaxError covers ElementTree.ParseError
+        return hike_id, None, "%s: %s" % (os.path.basename(path), e)
+    return hike_id, analysis, None
+
+
+# a hike's TrackAnalysis, from the cached profile unless the track changed since, or None without a readable track
+def track_analysis(hike_id):
+    path = track_path(hike_id)
+    try:
+        with open(os.path.splitext(path)[0] + ".profile.json") as file:
+            cache = json.load(file)
+        if cache["track"] == os.path.getmtime(path):
+            return TrackAnalysis(*cache["analysis"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if not os.path.exists(path):
+        return None
+    return analyze_track_file(path)[1]
+
+
+TrackBatch = namedtuple("TrackBatch", ["analyzed", "errors", "seconds"])
+
+
+# analyze every <hike id>.gpx in directory across a process pool, then write distance, gain and high point back to
+# the catalog in one transaction
+def analyze_tracks(directory=TRACKS_DIR):
+    started = time.perf_counter()
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if re.fullmatch(r"\d+\.gpx", name)]
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        results = list(pool.map(analyze_track_file, paths, chunksize=max(1, len(paths) // (4 * workers))))
+    stats, errors = [], []
+    for hike_id, analysis, error in results:
+        if error is not None:
+            errors.append(error)
+            continue
+        gain = None if analysis.gain is None else round(analysis.gain * FEET_PER_METER)
+        highest = None if analysis.highest is None else round(analysis.highest * FEET_PER_METER)
+        stats.append((round(analysis.km / KM_PER_MILE, 1), gain, highest, hike_id))
+    storage.save_track_stats(stats)
+    return TrackBatch(len(stats), errors, time.perf_counter() - started)
+
+
+# analyze a directory of tracks from the command line
+def analyze_catalog_tracks(directory):
+    storage.prepare()
+    result = analyze_tracks(directory)
+    print("Analyzed %d tracks in %.1f s, %d failed" % (result.analyzed, result.seconds, len(result.errors)))
+    for error in result.errors[:IMPORT_ERRORS_SHOWN]:
+        print("  " + error)
+
+
+# write-behind queue for notes and completion status. saves are coalesced per hike (the latest edit wins) and
+# flushed together through storage.save_edits in one transaction on a background thread, so saving never waits on
+# the database. a failed flush puts its edits back, unless the hike was edited again meanwhile, and retries. edits
+# still unsent at exit can be kept in PENDING_EDITS_FILE, which the next start queues again
+class HikeWriter:
+
+    def __init__(self):
+        self.pending = {}  # hike id -> (notes, complete)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.resumed = False  # PENDING_EDITS_FILE stays until its edits are written
+
+    def save(self, hike_id, notes, complete):
+        with self.lock:
+            self.pending[hike_id] = (notes, complete)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(WRITE_FLUSH_DELAY)  # let quick successive edits coalesce
+            self.wake.clear()
+            if not self.flush():
+                time.sleep(WRITE_RETRY_DELAY)
+                self.wake.set()
+
+    # write everything pending, returns False if it has to be retried
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return True
+        try:
+            storage.save_edits(batch)
+        except StorageError:
+            with self.lock:
+                for hike_id, edit in batch.items():
+                    self.pending.setdefault(hike_id, edit)
+            return False
+
+        if self.resumed:
+            self.resumed = False
+            try:
+                os.remove(PENDING_EDITS_FILE)
+            except OSError:
+                pass  # already gone
+        return True
+
+    # keep the edits still pending in PENDING_EDITS_FILE
+    def save_pending(self):
+        with self.lock:
+            edits = [[hike_id, notes, complete] for hike_id, (notes, complete) in self.pending.items()]
+        with open(PENDING_EDITS_FILE, "w") as file:
+            json.dump(edits, file)
+
+    # queue the edits an earlier run left in PENDING_EDITS_FILE, returns them as {hike id: (notes, complete)}
+    def resume(self):
+        try:
+            with open(PENDING_EDITS_FILE) as file:
+                edits = {hike_id: (notes, complete) for hike_id, notes, complete in json.load(file)}
+        except (OSError, ValueError):
+            return {}
+        self.resumed = True
+        for hike_id, (notes, complete) in edits.items():
+            self.save(hike_id, notes, complete)
+        return edits
+
+
+hike_writer = HikeWriter()
+
+
+# one search, run on a worker thread so the window stays responsive. storage does the filtering when it can and its
+# rows are posted as ("hikes", Hike records) for the tk thread to merge into hike_index; otherwise the in-memory
+# index is checked a chunk of candidates at a time, posting ("matches", row ids) per chunk. either way the job ends
+# with ("done", ranked row ids or None to rank what was posted), after ("restart",) for each time the index changed
+# under it, or with ("failed", reason) if it raised. cancel() stops it at the next chunk
+class SearchJob:
+
+    def __init__(self, query, candidates=None, use_storage=False):
+        self.query = query
+        self.candidates = candidates  # rows known to contain every match, e.g. an earlier broader result
+        self.use_storage = use_storage
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.row_ids = []  # matches collected so far by the tk thread
+        self.shown = 0  # how many of them the results table has
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            with profiler.span("search", keyword=self.query.keyword, ranges=len(self.query.ranges)):
+                self.search()
+        except Exception as e:
+            # the tk thread waits for a last message, so it gets one before the traceback
+            self.messages.put(("failed", str(e)))
+            raise
+
+    def search(self):
+        if self.use_storage and can_push_down(self.query):
+            try:
+                with profiler.span("search.storage"):
+                    rows = storage.search(self.query)
+            except StorageError:
+                rows = None  # offline, search the catalog loaded at startup instead
+            if rows is not None:
+                for start in range(0, len(rows), SEARCH_CHUNK):
+                    if self.cancelled.is_set():
+                        return
+                    self.messages.put(("hikes", [Hike.from_row(row) for row in rows[start:start + SEARCH_CHUNK]]))
+                self.messages.put(("done", None))
+                return
+        # the tk thread applies syncs while this reads the index, so a search that saw the index's version change
+        # may have mixed old and new rows, or tripped over a row removed under it, and is run again
+        for attempt in range(SEARCH_RETRIES + 1):
+            index = hike_index
+            version = index.version
+            try:
+                row_ids = self.search_index(index)
+            except Exception:
+                if index.version == version or attempt == SEARCH_RETRIES:
+                    raise
+                row_ids = None
+            if self.cancelled.is_set():
+                return
+            if index.version == version or attempt == SEARCH_RETRIES:
+                self.messages.put(("done", row_ids))
+                return
+            self.candidates = None  # an earlier result may hold rows the change removed
+            self.messages.put(("restart",))
+
+    # post the matches a chunk at a time and return them ranked, None if cancelled
+    def search_index(self, index):
+        query = self.query
+        if self.candidates is None and not query.keyword:
+            # the planner's index lookups and bitset scans beat checking rows one by one, so search in one go and
+            # stream the result
+            row_ids = index.search(query)
+            for start in range(0, len(row_ids), SEARCH_CHUNK):
+                if self.cancelled.is_set():
+                    return None
+                self.messages.put(("matches", row_ids[start:start + SEARCH_CHUNK]))
+            return row_ids
+        candidates = index.candidates(query) if self.candidates is None else self.candidates
+        matched = []
+        for start in range(0, len(candidates), SEARCH_CHUNK):
+            if self.cancelled.is_set():
+                return None
+            chunk = [row_id for row_id in candidates[start:start + SEARCH_CHUNK] if index.matches(row_id, query)]
+            matched += chunk
+            self.messages.put(("matches", chunk))
+        return index.rank(matched, query.keyword)
+
+
+# background poller that keeps the loaded catalog in step with the database. every SYNC_INTERVAL seconds it asks for
+# the high water mark and, only if that moved, fetches the rows changed and deleted since the last one and posts
+# ("changes", hikes, deleted ids) to messages for the tk thread to apply
+class CatalogSync:
+
+    def __init__(self, high_water, messages):
+        self.high_water = high_water
+        self.messages = messages
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                latest = storage.high_water()
+                if latest != self.high_water:
+                    rows, deleted = storage.changed_since(self.high_water)
+                    self.messages.put(("changes", [Hike.from_row(row) for row in rows], deleted))
+                    self.high_water = latest
+            except StorageError:
+                pass  # offline, try again next time
+
+
+# process-wide cache of images keyed by path and size. Pillow decodes (and optionally shrinks to fit size) either on
+# first use or ahead of time on a background thread, and each image becomes a PhotoImage once, on the tk thread.
+# least recently used images are dropped once the cache holds more than max_bytes of pixels; widgets still showing
+# one keep their own reference, so eviction never blanks a label
+class ImageCache:
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.decoded = {}  # (path, size) -> decoded PIL image waiting to become a PhotoImage
+        self.photos = OrderedDict()  # (path, size) -> PhotoImage, least recently used first
+        self.lock = threading.Lock()
+
+    # decode an image with Pillow, safe to call from any thread. size is a (width, height) box to thumbnail into
+    def decode(self, path, size=None):
+        key = (path, size)
+        with self.lock:
+            if key in self.decoded:
+                return self.decoded[key]
+        image = Image.open(path)
+        image.load()
+        if size:
+            image.thumbnail(size)
+        with self.lock:
+            self.decoded[key] = image
+        return image
+
+    # decode images on a background thread so the first get() doesn't have to
+    def preload(self, paths, size=None):
+        threading.Thread(target=lambda: [self.decode(path, size) for path in paths], daemon=True).start()
+
+    # PhotoImage for path, tk thread only
+    def get(self, path, size=None):
+        key = (path, size)
+        if key in self.photos:
+            self.photos.move_to_end(key)
+            return self.photos[key]
+
+        image = self.decode(path, size)
+        photo = ImageTk.PhotoImage(image)
+        with self.lock:
+            self.decoded.pop(key, None)
+        self.photos[key] = photo
+        self.used_bytes += photo.width() * photo.height() * 4
+        while self.used_bytes > self.max_bytes and len(self.photos) > 1:
+            old_key, old_photo = self.photos.popitem(last=False)
+            self.used_bytes -= old_photo.width() * old_photo.height() * 4
+        return photo
+
+
+image_cache = ImageCache()
+
 
 class MainApp(tk.Tk):
 
@@ -57,31 +2798,202 @@ class MainApp(tk.Tk):
 
         container.grid_rowconfigure(0, weight=1)
         container.grid_columnconfigure(0, weight=1)
+        self.container = container
 
-        # create empty frames dictionary
-        self.frames = {}
-        # add frame objects to dictionary
-        for f in (MainMenu, Search, SearchResults, MyHikes, AllHikes):
-            frame = f(container, self)
-            self.frames[f] = frame
-            frame.grid(column=0, row=0, sticky="nsew")
+        # decode the other frames' images while the main menu is up
+        image_cache.preload(APP_IMAGES)
 
+        # create empty frames dictionary, frames are added the first time they are needed
+        self.frames = {}
         self.show_frame(MainMenu)
 
+        # load the catalog in the background so the window appears right away
+        self.catalog_ready = False
+        self.load_messages = queue.Queue()
+        threading.Thread(target=load_catalog, args=(self.load_messages,), daemon=True).start()
+        self.after(LOAD_POLL_INTERVAL, self.poll_catalog_load)
+
+        self.first_paint_ms = None
+        self.after_idle(self.on_first_paint)
+
+        self.profiler_window = None
+        if profiler.enabled:
+            self.sample_latency(time.perf_counter())
+            self.bind("<F12>", lambda e: self.toggle_profiler_overlay())
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    # a timer runs late by however long the event loop was busy when it came due
+    def sample_latency(self, due):
+        now = time.perf_counter()
+        profiler.sample("tk.latency", max(now - due, 0.0))
+        self.after(PROFILE_SAMPLE_INTERVAL, self.sample_latency, now + PROFILE_SAMPLE_INTERVAL / 1000)
+
+    def toggle_profiler_overlay(self):
+        if self.profiler_window is not None and self.profiler_window.winfo_exists():
+            self.profiler_window.destroy()
+            self.profiler_window = None
+        else:
+            self.profiler_window = show_profiler_overlay()
+
+    # write any saves still queued before exiting. while the database can't take them the user can try again, or
+    # leave them in PENDING_EDITS_FILE for the next start to send
+    def on_close(self):
+        while not hike_writer.flush():
+            if not messagebox.askretrycancel("Changes Not Saved", "Your notes and completion status couldn't be saved "
+                                             "to the database. Cancel keeps them on this computer and sends them the "
+                                             "next time the app starts."):
+                hike_writer.save_pending()
+                break
+        self.destroy()
+
     def show_frame(self, cont):
-        frame = self.frames[cont]
+        frame = self.get_page(cont)
         frame.tkraise()
 
+    # build a frame on first use
     def get_page(self, page_class):
+        if page_class not in self.frames:
+            frame = page_class(self.container, self)
+            self.frames[page_class] = frame
+            frame.grid(column=0, row=0, sticky="nsew")
         return self.frames[page_class]
 
+    def on_first_paint(self):
+        self.first_paint_ms = (time.perf_counter() - START_TIME) * 1000
+        profiler.sample("startup.first_paint", self.first_paint_ms / 1000)
+
+    # handle everything the loader thread has posted since the last check
+    def poll_catalog_load(self):
+        while True:
+            try:
+                message = self.load_messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                self.frames[MainMenu].set_status("Loading hikes... %d of %d" % (message[1], message[2]))
+            elif message[0] == "loaded":
+                self.on_catalog_loaded(*message[1:])
+                return
+            else:
+                messagebox.showerror("Connection Error", "Unable to connect to database. Check your connection and "
+                                                         "try again.")
+                self.destroy()
+                return
+        self.after(LOAD_POLL_INTERVAL, self.poll_catalog_load)
+
+    # swap in the loaded catalog and refresh any frame already showing hikes, then start syncing changes if the
+    # storage backend tracks them
+    def on_catalog_loaded(self, index, notes, high_water):
+        global hike_index, search_cache, notes_loaded
+        notes_loaded = notes is not None
+        hike_notes.update(notes or {})
+        hike_index = index
+        search_cache = SearchCache(index)
+        if not storage.read_only:
+            # edits the last run couldn't send are newer than what was just loaded
+            for hike_id, (notes, complete) in hike_writer.resume().items():
+                hike = index.get(hike_id)
+                if hike is not None:
+                    index.upsert(hike.replace(complete=complete))
+                if notes is not None:
+                    hike_notes[hike_id] = notes
+        self.catalog_ready = True
+        self.frames[MainMenu].set_status("")
+        for page_class in (MyHikes, AllHikes):
+            if page_class in self.frames:
+                self.frames[page_class].refresh()
+        self.background_messages = queue.Queue()
+        self.after(SYNC_POLL_INTERVAL, self.poll_background)
+        if high_water is not None:
+            CatalogSync(high_water, self.background_messages).start()
+        self.route_trailheads()
+        self.after(1, self.build_text_index)
+
+    # post the keyword index a chunk at a time between tk events. until it is done, keyword searches also scan the
+    # rows it hasn't reached
+    def build_text_index(self):
+        if not hike_index.text_index.build(TEXT_INDEX_CHUNK):
+            self.after(1, self.build_text_index)
+
+    # apply what the sync and routing threads have posted
+    def poll_background(self):
+        while True:
+            try:
+                message = self.background_messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "changes":
+                self.on_catalog_changes(*message[1:])
+            elif message[0] == "drive_times":
+                self.on_drive_times(*message[1:])
+            elif message[0] == "imported":
+                self.on_hikes_imported(*message[1:])
+            elif message[0] == "import_done":
+                self.on_import_done(*message[1:])
+            elif message[0] == "import_failed":
+                messagebox.showerror("Import Failed", message[1])
+            elif message[0] == "track_profile":
+                frame, analysis = message[1:]
+                if frame.winfo_exists():  # unless its pop up was closed first
+                    frame.show_profile(analysis)
+        self.after(SYNC_POLL_INTERVAL, self.poll_background)
+
+    # route drive times from home to every trailhead in the background, if there is a road graph to route over
+    def route_trailheads(self):
+        if not drive_times.available():
+            return
+        trailheads = [(hike_index.rows[row_id].id, hike_index.rows[row_id].lat, hike_index.rows[row_id].lon)
+                      for row_id in hike_index.live_ids() if hike_index.rows[row_id].lat is not None]
+        threading.Thread(target=route_trailheads, args=(hike_index.home, trailheads, self.background_messages),
+                         daemon=True).start()
+
+    # import a trail file in the background, adding its hikes to the tables batch by batch
+    def start_import(self, path):
+        threading.Thread(target=import_trail_file, args=(path, self.background_messages), daemon=True).start()
+
+    # imported records don't carry the user's complete and my hike flags, and the database keeps them on update
+    def on_hikes_imported(self, hikes):
+        for pos, hike in enumerate(hikes):
+            current = hike_index.get(hike.id)
+            if current is not None:
+                hikes[pos] = hike.replace(complete=current.complete, my_hike=current.my_hike)
+        self.on_catalog_changes(hikes, ())
+
+    def on_import_done(self, result):
+        text = "Imported %d hikes in %.1f seconds (%.0f hikes/s)." % (
+            result.imported, result.seconds, result.imported / max(result.seconds, 1e-9))
+        if result.skipped:
+            text += "\n\nSkipped %d:\n" % result.skipped + "\n".join(result.errors[:5])
+        messagebox.showinfo("Import Complete", text)
+        self.route_trailheads()  # the new trailheads have no drive times yet
+
+    def on_drive_times(self, home, times):
+        if home == hike_index.home:  # else the home changed while routing
+            hike_index.set_drive_times(times)
+            HikeTable.render_all()
+
+    # apply synced changes to the index and patch the tables showing hikes, without rebuilding either
+    def on_catalog_changes(self, hikes, deleted_ids):
+        # a local edit still waiting to be written is newer than the database's copy
+        hikes = [hike for hike in hikes if hike.id not in hike_writer.pending]
+        added, updated, removed = hike_index.sync(hikes, deleted_ids)
+        if not (added or updated or removed):
+            return
+        for page_class in (MyHikes, AllHikes):
+            if page_class in self.frames:
+                self.frames[page_class].on_changes(added, updated, removed)
+        if SearchResults in self.frames and removed:
+            self.frames[SearchResults].tview_search_results.update_rows(remove=removed)
+        HikeTable.render_all()
+
 
 # main menu
 class MainMenu(tk.Frame):
 
     def __init__(self, parent, controller):
-        self.main_background = ImageTk.PhotoImage(Image.open(r"peak_pro_main_bg.jpg"))
-        self.main_title = ImageTk.PhotoImage(Image.open(r"main_title.png"))
+        self.main_background = image_cache.get(r"peak_pro_main_bg.jpg")
+        self.main_title = image_cache.get(r"main_title.png")
 
         tk.Frame.__init__(self, parent)
         self.lbl_background = tk.Label(
@@ -142,6 +3054,40 @@ class MainMenu(tk.Frame):
         )
         self.btn_view_my_hikes.pack(pady=(5, 0))
 
+        self.btn_home_location = tk.Button(
+            master=self,
+            text="Set Home Location",
+            font=("Comic Book", 23, "bold"),
+            width=20,
+            bg="#939bb0",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            pady=12,
+            command=lambda: show_home_location(controller)
+        )
+        self.btn_home_location.pack(pady=(5, 0))
+
+        # loading progress, hidden once the catalog is ready
+        self.lbl_status = tk.Label(
+            master=self,
+            text="",
+            font=("Comic Book", 12),
+            bg="#939bb0",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            padx=10,
+            pady=4
+        )
+
+    def set_status(self, text):
+        if text:
+            self.lbl_status.config(text=text)
+            self.lbl_status.pack(pady=(20, 0))
+        else:
+            self.lbl_status.pack_forget()
+
 
 # search class (find a hike)
 class Search(tk.Frame):
@@ -154,8 +3100,8 @@ class Search(tk.Frame):
 
         tk.Frame.__init__(self, parent)
 
-        self.main_background = ImageTk.PhotoImage(Image.open(r"peak_pro_main_bg.jpg"))
-        self.search_title = ImageTk.PhotoImage(Image.open(r"search_title.png"))
+        self.main_background = image_cache.get(r"peak_pro_main_bg.jpg")
+        self.search_title = image_cache.get(r"search_title.png")
 
         # setup for input validation: '%S' = text string being inserted/deleted
         val_cmd = (self.register(self.val_int_input), '%S')
@@ -418,7 +3364,8 @@ class Search(tk.Frame):
 
         self.drop5_string = tk.StringVar()
         self.drop5_string.set("Select Distance ▼")
-        distances_lst = ["Select Distance ▼", "< 1 hour", "< 2 hours", "< 3 hours", "< 4 hours"]
+        distances_lst = ["Select Distance ▼", "Within 15 km", "Within 30 km", "Within 60 km", "Within 100 km",
+                         "Within 200 km", "< 1 hour drive", "< 2 hours drive", "< 3 hours drive", "< 4 hours drive"]
         drop5 = tk.OptionMenu(frame_search_columns, self.drop5_string, *distances_lst)
         drop5.config(
             indicatoron=0,
@@ -433,6 +3380,41 @@ class Search(tk.Frame):
         )
         drop5.grid(column=1, row=5, sticky="e", padx=(15, 30), pady=(15, 0))
 
+        # live search toggle and match count
+        frame_live_search = tk.Frame(
+            master=frame_search_box,
+            bg="#6a96c6",
+        )
+        frame_live_search.pack(pady=(10, 0))
+
+        self.live_val = tk.IntVar()
+        chk_live_search = tk.Checkbutton(
+            master=frame_live_search,
+            text="Search as I type",
+            font=("Comic Book", 12),
+            bg="#6a96c6",
+            fg="white",
+            selectcolor="#1b4760",
+            activebackground="#6a96c6",
+            borderwidth=0,
+            highlightthickness=0,
+            variable=self.live_val,
+            command=self.schedule_live_search
+        )
+        chk_live_search.grid(column=0, row=0)
+
+        self.lbl_live_count = tk.Label(
+            master=frame_live_search,
+            text="",
+            font=("Comic Book", 12),
+            bg="#6a96c6",
+            fg="white",
+            width=20,
+            borderwidth=0,
+            highlightthickness=0,
+        )
+        self.lbl_live_count.grid(column=1, row=0, padx=(15, 0))
+
         btn_search = tk.Button(
             master=frame_search_box,
             text=" Go!",
@@ -445,7 +3427,7 @@ class Search(tk.Frame):
             pady=5,
             command=self.search
         )
-        btn_search.pack(pady=(15, 20))
+        btn_search.pack(pady=(10, 20))
 
         btn_back = tk.Button(
             master=self,
@@ -461,6 +3443,14 @@ class Search(tk.Frame):
         )
         btn_back.pack(pady=25)
 
+        # re-run the live search whenever any search input changes
+        self.live_after_id = None
+        self.job = None  # running SearchJob
+        self.job_after_id = None
+        for var in (self.name_val, self.dist_val, self.elev_change_val, self.max_elev_val, self.drop1_string,
+                    self.drop2_string, self.drop3_string, self.drop4_string, self.drop5_string):
+            var.trace('w', self.schedule_live_search)
+
     # limit name entry box characters to 24
     def limit_name_chars(self, *args):
         value = self.name_val.get()
@@ -518,173 +3508,395 @@ class Search(tk.Frame):
     def is_empty(self):
         return self.search_results == []
 
-    # search list from database
-    def search(self):
-        search_bool = False
-        self.search_results.clear()  # resets list of previous search results, if any
-
-        ''' to account for multiple parameters, a full list is initialized and items are deleted if they do not meet 
-        search criteria. there is probably a better way to do this, but this works '''
-
-        for hike in hike_list:
-            self.search_results.append(hike)
-
-        # search for name/keyword
-        if len(self.ent_name.get()) > 0:
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            name = self.ent_name.get().lower()
-            while i < length:
-                if name in self.search_results[i][1].lower() or name in self.search_results[i][7].lower() or \
-                        name in self.search_results[i][11].lower():
-                    i += 1
+    # read the search form into a HikeQuery
+    def read_query(self):
+        ranges = []
+        numeric_inputs = (
+            (self.drop1_string, self.ent_distance, "distance"),
+            (self.drop2_string, self.ent_elevation_gain, "elev_gain"),
+            (self.drop3_string, self.ent_max_elevation, "max_elev"),
+        )
+        for drop_string, entry, column in numeric_inputs:
+            if "▼" not in drop_string.get() and entry.get():
+                if "Greater" in drop_string.get():
+                    ranges.append((column, float(entry.get()), None))
                 else:
-                    del self.search_results[i]
-                    length -= 1
-
-        # search list for distances
-        if "▼" not in self.drop1_string.get():
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            if "Greater" in self.drop1_string.get():
-                while i < length:
-                    if int(self.ent_distance.get()) <= self.search_results[i][2]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            else:
-                while i < length:
-                    if int(self.ent_distance.get()) >= self.search_results[i][2]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-
-        # search list for elevation gain
-        if "▼" not in self.drop2_string.get():
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            if "Greater" in self.drop2_string.get():
-                while i < length:
-                    if int(self.ent_elevation_gain.get()) <= self.search_results[i][3]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            else:
-                while i < length:
-                    if int(self.ent_elevation_gain.get()) >= self.search_results[i][3]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-
-        # search list for max elevation
-        if "▼" not in self.drop3_string.get():
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            if "Greater" in self.drop3_string.get():
-                while i < length:
-                    if int(self.ent_max_elevation.get()) <= self.search_results[i][4]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            else:
-                while i < length:
-                    if int(self.ent_max_elevation.get()) >= self.search_results[i][4]:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
+                    ranges.append((column, None, float(entry.get())))
 
-        # search list for max difficulty rating
+        # max difficulty rating, a ceiling on the difficulty score. every hike is within expert
         if "▼" not in self.drop4_string.get():
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            if "easy" in self.drop4_string.get().lower():
-                while i < length:
-                    if self.search_results[i][6].lower() == "easy":
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            elif "moderate" in self.drop4_string.get().lower():
-                while i < length:
-                    if "moderate" in self.search_results[i][6].lower() or "easy" in self.search_results[i][6].lower():
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            elif "hard" in self.drop4_string.get().lower():
-                while i < length:
-                    if "hard" in self.search_results[i][6].lower() or "moderate" in self.search_results[i][6].lower() \
-                            or "easy" in self.search_results[i][6].lower():
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            else:
-                pass
+            difficulty = Difficulty[self.drop4_string.get().upper()]
+            if difficulty < Difficulty.EXPERT:
+                ranges.append(("difficulty_score", None, difficulty.ceiling))
 
-        # search list for max distance from home
+        # max distance from home, e.g. "Within 60 km", or drive time, e.g. "< 2 hours drive"
         if "▼" not in self.drop5_string.get():
-            search_bool = True
-            length = len(self.search_results)
-            i = 0
-            if "1" in self.drop5_string.get():
-                while i < length:
-                    if self.search_results[i][8] <= 1:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            elif "2" in self.drop5_string.get():
-                while i < length:
-                    if self.search_results[i][8] <= 2:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
-            elif "3" in self.drop5_string.get():
-                while i < length:
-                    if self.search_results[i][8] <= 3:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
+            limit = float(self.drop5_string.get().split()[1])
+            if self.drop5_string.get().endswith("km"):
+                ranges.append(("km_from_home", None, limit))
             else:
-                while i < length:
-                    if self.search_results[i][8] <= 4:
-                        i += 1
-                    else:
-                        del self.search_results[i]
-                        length -= 1
+                ranges.append(("hours_from_home", None, limit))
+
+        return HikeQuery(self.ent_name.get().lower(), tuple(ranges))
+
+    # true if the form has something to search by. a difficulty of "Expert" adds no range, since every hike is within
+    # it, but still counts and matches the whole catalog
+    def has_parameters(self, query):
+        return bool(query.keyword or query.ranges) or "▼" not in self.drop4_string.get()
+
+    # restart the live search after a short pause in typing, cancelling any search still running
+    def schedule_live_search(self, *args):
+        self.cancel_search()
+        if self.live_after_id:
+            self.after_cancel(self.live_after_id)
+            self.live_after_id = None
+        if not self.live_val.get():
+            self.lbl_live_count.config(text="")
+            return
+        self.live_after_id = self.after(LIVE_SEARCH_DELAY, self.start_live_search)
+
+    def start_live_search(self):
+        self.live_after_id = None
+        if not self.controller.catalog_ready:
+            return
+        try:
+            query = self.read_query()
+        except ValueError:
+            return  # number still being typed
+        if not self.has_parameters(query):
+            self.lbl_live_count.config(text="")
+            return
+
+        cached = search_cache.get(query)
+        if cached is not None:
+            self.finish_live_search(cached)
+            return
+        self.lbl_live_count.config(text="Searching...")
+        self.start_search(SearchJob(query, search_cache.closest(query)))
+
+    def finish_live_search(self, row_ids):
+        self.search_results[:] = row_ids
+        if len(row_ids) == 1:
+            self.lbl_live_count.config(text="1 matching hike")
+        else:
+            self.lbl_live_count.config(text=str(len(row_ids)) + " matching hikes")
+
+    # search list from database
+    def search(self):
+        if not self.controller.catalog_ready:
+            messagebox.showinfo("Loading", "Hikes are still loading. Please try again in a moment.")
+            return
+        query = self.read_query()
 
         # prevent search unless user selects at least one search parameter
-        if not search_bool:
+        if not self.has_parameters(query):
+            self.search_results.clear()
             messagebox.showinfo("Empty Values", "Please enter at least one search parameter.")
+            return
+
+        cached = search_cache.get(query)
+        if cached is not None:
+            self.search_results[:] = cached
+            self.show_results()
+        else:
+            # the storage backend filters when it can, narrowing an earlier result is the offline fallback
+            self.start_search(SearchJob(query, search_cache.closest(query), use_storage=True))
+
+    def show_results(self):
         # no matches
-        elif self.is_empty():
+        if self.is_empty():
             messagebox.showinfo("No Results", "The search yielded no results. Please try again.")
         else:
             self.controller.get_page(SearchResults).populate()
             self.controller.show_frame(SearchResults)
 
+    # run a job in the background, superseding any search still running
+    def start_search(self, job):
+        self.cancel_search()
+        self.job = job
+        self.job_after_id = self.after(SEARCH_POLL_INTERVAL, self.poll_search)
+
+    def cancel_search(self):
+        if self.job is None:
+            return
+        self.job.cancel()
+        self.after_cancel(self.job_after_id)
+        if self.job.shown:
+            # keep what was found so far on screen
+            self.search_results[:] = self.job.row_ids
+            self.controller.get_page(SearchResults).stop(len(self.job.row_ids))
+        self.job = None
+
+    # collect what the worker has posted since the last check. a live search only updates the match count, a search
+    # from the Go button streams its matches into the results table as they arrive
+    def poll_search(self):
+        job = self.job
+        # about one chunk of rows per callback, so a backlog of messages can't hold up tk events
+        taken = 0
+        while taken < SEARCH_CHUNK:
+            try:
+                message = job.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] in ("hikes", "matches"):
+                taken += len(message[1])
+            if message[0] == "hikes":
+                for hike in message[1]:
+                    # a local edit still waiting to be written is newer than the database's copy
+                    row_id = hike_index.by_id.get(hike.id) if hike.id in hike_writer.pending else None
+                    job.row_ids.append(hike_index.upsert(hike) if row_id is None else row_id)
+            elif message[0] == "matches":
+                job.row_ids += message[1]
+            elif message[0] == "restart":
+                job.row_ids = []
+                job.shown = 0
+            elif message[0] == "failed":
+                self.job = None
+                if not job.use_storage:
+                    self.lbl_live_count.config(text="")
+                    return
+                if job.shown:
+                    self.search_results[:] = job.row_ids
+                    self.controller.get_page(SearchResults).stop(len(job.row_ids), "Search failed, ")
+                messagebox.showerror("Search Failed", "The search stopped with an error: " + message[1])
+                return
+            else:
+                row_ids = message[1]
+                if row_ids is None:
+                    row_ids = job.row_ids
+                if hike_index.deleted:
+                    # rows a sync removed after the search passed them
+                    row_ids = [row_id for row_id in row_ids if row_id not in hike_index.deleted]
+                if message[1] is None:
+                    row_ids = hike_index.rank(row_ids, job.query.keyword)
+                search_cache.put(job.query, row_ids)
+                self.job = None
+                self.search_results[:] = row_ids
+                if not job.use_storage:
+                    self.finish_live_search(row_ids)
+                elif job.shown:
+                    self.controller.get_page(SearchResults).finish()
+                else:
+                    self.show_results()
+                return
+
+        if not job.use_storage:
+            self.lbl_live_count.config(text="Searching... " + str(len(job.row_ids)))
+        elif len(job.row_ids) > job.shown:
+            results = self.controller.get_page(SearchResults)
+            if not job.shown:
+                results.start()
+                self.controller.show_frame(SearchResults)
+            results.add(job.row_ids[job.shown:])
+            job.shown = len(job.row_ids)
+        # come straight back for the rest of a backlog, after tk has had its turn
+        self.job_after_id = self.after(1 if taken >= SEARCH_CHUNK else SEARCH_POLL_INTERVAL, self.poll_search)
+
+
+# treeview columns: (column id, heading text, width)
+TABLE_COLUMNS = (
+    ("complete", "✔", 30),
+    ("name", "Name", 200),
+    ("total_distance", "Total Dist", 100),
+    ("elev_gain", "Elev Gain", 100),
+    ("max_elev", "Max Elev", 100),
+    ("prominence", "Prominence", 100),
+    ("diff_rating", "Diff Rating", 110),
+    ("gen_area", "General Area", 150),
+    ("dist_from_home", "Dist from Home", 130),
+)
+
+
+# treeview values for one hike, as finished strings so tk has nothing left to convert. km is the distance from home,
+# inf when the trailhead's location is unknown, and drive_hours the routed drive time if there is one
+def hike_values(hike, km, drive_hours=None):
+    if hike.complete == 1:
+        complete = "✔"
+    else:
+        complete = " "
+    if hike.prominence == 0:
+        prom = "N/A"
+    else:
+        prom = "%d ft" % hike.prominence
+    return (complete, hike.name, "%r miles" % hike.distance, "%d ft" % hike.elev_gain, "%d ft" % hike.max_elev, prom,
+            hike.difficulty.label, hike.area, distance_text(hike, km, drive_hours))
+
+
+# distance from home, falling back to the static hours from Tacoma without trailhead coordinates
+def distance_text(hike, km, drive_hours=None):
+    if km == math.inf:
+        if hike.hours_from_home == math.inf:
+            return "Unknown"
+        return "%r hours" % hike.hours_from_home
+    if drive_hours is not None:
+        return "%.0f km, %.1f h" % (km, drive_hours)
+    return "%.0f km" % km
+
+
+# virtual treeview over a list of hike_index row ids. the tree only ever holds enough items to fill the viewport,
+# and scrolling rewrites those items' values instead of inserting new ones, so showing 50k hikes costs the same as
+# showing 8
+class HikeTable:
+
+    # rows that fit in the 475px results box at 55px per row
+    visible_rows = 8
+
+    # every table, so all of them can be redrawn when hikes change
+    instances = []
+
+    def __init__(self, master, on_double_click):
+        HikeTable.instances.append(self)
+        self.row_ids = []
+        self.top = 0  # index into row_ids of the first visible row
+        self.selected_row = None
+
+        self.tree = ttk.Treeview(master, style="Custom.Treeview", selectmode="browse", height=self.visible_rows)
+        self.tree['columns'] = [column for column, heading, width in TABLE_COLUMNS]
+        self.tree.column("#0", width=0, minwidth=0)
+        self.tree.heading("#0", text="Label", anchor="w")
+        for column, heading, width in TABLE_COLUMNS:
+            self.tree.column(column, width=width, minwidth=width)
+            self.tree.heading(column, text=heading, command=lambda _col=column: self.sort(_col, False))
+        self.tree.column("complete", anchor="c")
+
+        # recycled item slots, detached while there are fewer rows than slots
+        self.slots = [self.tree.insert(parent='', index='end', iid="slot" + str(i), text="")
+                      for i in range(self.visible_rows)]
+
+        self.tree.bind("<Double-1>", on_double_click)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1))
+        self.tree.bind("<Up>", lambda e: self.on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self.on_arrow(1))
+
+        # scrollbar for treeview
+        self.vsb = ttk.Scrollbar(
+            master,
+            orient="vertical",
+            command=self.yview
+        )
+
+        self.tree.pack(side='left')
+        self.vsb.pack(side='right', fill='y')
+        self.render()
+
+    # show a new list of row ids from the top
+    def show(self, row_ids):
+        self.row_ids = list(row_ids)
+        self.top = 0
+        self.selected_row = None
+        self.render()
+
+    # append row ids and drop others in place, keeping the scroll position. only a removal walks the whole list
+    def update_rows(self, add=(), remove=()):
+        if remove:
+            remove = set(remove)
+            self.row_ids = [row_id for row_id in self.row_ids if row_id not in remove]
+        self.row_ids += add
+        self.top = max(0, min(self.top, len(self.row_ids) - len(self.slots)))
+
+    # redraw every table's visible rows
+    @staticmethod
+    def render_all():
+        for table in HikeTable.instances:
+            table.render()
+
+    # rewrite the slots with the rows currently in view
+    def render(self):
+        with profiler.span("table.render"):
+            self.render_window()
+
+    def render_window(self):
+        window = self.row_ids[self.top:self.top + len(self.slots)]
+        attached = self.tree.get_children('')
+        for index, slot in enumerate(self.slots):
+            if index < len(window):
+                self.tree.item(slot, values=hike_index.display_row(window[index]))
+                self.tree.move(slot, '', index)
+            elif slot in attached:
+                self.tree.detach(slot)
+
+        if self.selected_row in window:
+            self.tree.selection_set(self.slots[window.index(self.selected_row)])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if self.row_ids:
+            self.vsb.set(self.top / len(self.row_ids), (self.top + len(window)) / len(self.row_ids))
+        else:
+            self.vsb.set(0, 1)
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.row_ids) - len(self.slots)))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+        return "break"
+
+    # scrollbar command, same protocol as Treeview.yview
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.row_ids)))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= len(self.slots)
+            self.scroll(amount)
+
+    # row id shown in a slot, or None
+    def slot_row(self, slot):
+        if slot not in self.slots:
+            return None
+        index = self.top + self.slots.index(slot)
+        return self.row_ids[index] if index < len(self.row_ids) else None
+
+    # row id of the focused item, or None
+    def focused_row(self):
+        return self.slot_row(self.tree.focus())
+
+    def on_select(self, *args):
+        selection = self.tree.selection()
+        if selection:
+            self.selected_row = self.slot_row(selection[0])
+
+    # arrow keys past the first or last visible row scroll the table instead of leaving the viewport
+    def on_arrow(self, step):
+        focus = self.tree.focus()
+        if focus not in self.slots:
+            return None
+        index = self.slots.index(focus) + step
+        if 0 <= index < min(len(self.slots), len(self.row_ids) - self.top):
+            return None  # let the treeview move the selection
+        self.scroll(step)
+        row_id = self.slot_row(focus)
+        if row_id is not None:
+            self.selected_row = row_id
+            self.tree.selection_set(focus)
+        return "break"
+
+    # sort on the column's typed values, then redraw the viewport once
+    def sort(self, col, reverse):
+        with profiler.span("table.sort", column=col, rows=len(self.row_ids)):
+            self.row_ids = hike_index.sort_rows(col, self.row_ids, reverse)
+            self.top = 0
+            self.render()
+
+        # reverse sort next time
+        self.tree.heading(col, command=lambda _col=col: self.sort(_col, not reverse))
+
 
 # search results class
 class SearchResults(tk.Frame):
 
     def __init__(self, parent, controller):
         self.controller = controller
-        self.main_background = ImageTk.PhotoImage(Image.open(r"peak_pro_main_bg.jpg"))
-        self.search_results_title = ImageTk.PhotoImage(Image.open(r"search_results.png"))
+        self.main_background = image_cache.get(r"peak_pro_main_bg.jpg")
+        self.search_results_title = image_cache.get(r"search_results.png")
 
         tk.Frame.__init__(self, parent)
 
@@ -725,82 +3937,37 @@ class SearchResults(tk.Frame):
         tview_style.configure("Treeview", font=("Comic Book", 10), rowheight=55)
 
         # create treeview for search results
-        self.tview_search_results = ttk.Treeview(frame_search_results_box, style="Custom.Treeview", selectmode="browse")
-        self.tview_search_results['columns'] = ('complete', 'name', 'total_distance', 'elev_gain', 'max_elev',
-                                                'prominence', 'diff_rating', 'gen_area', 'dist_from_home')
-        self.tview_search_results.column("#0", width=0, minwidth=0)
-        self.tview_search_results.column("complete", width=30, minwidth=30, anchor="c")
-        self.tview_search_results.column("name", width=200, minwidth=200)
-        self.tview_search_results.column("total_distance", width=100, minwidth=100)
-        self.tview_search_results.column("elev_gain", width=100, minwidth=100)
-        self.tview_search_results.column("max_elev", width=100, minwidth=100)
-        self.tview_search_results.column("prominence", width=100, minwidth=100)
-        self.tview_search_results.column("diff_rating", width=110, minwidth=110)
-        self.tview_search_results.column("gen_area", width=150, minwidth=150)
-        self.tview_search_results.column("dist_from_home", width=130, minwidth=130)
-
-        ''' upon further reflection, i could have definitely combined these next few lines into a short loop. might fix 
-        later '''
-
-        self.tview_search_results.heading("#0", text="Label", anchor="w")
-        self.tview_search_results.heading(
-            "complete",
-            text="✔",
-            command=lambda _col="complete": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "name",
-            text="Name",
-            command=lambda _col="name": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "total_distance",
-            text="Total Dist",
-            command=lambda _col="total_distance": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "elev_gain",
-            text="Elev Gain",
-            command=lambda _col="elev_gain": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "max_elev",
-            text="Max Elev",
-            command=lambda _col="max_elev": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "prominence",
-            text="Prominence",
-            command=lambda _col="prominence": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "diff_rating",
-            text="Diff Rating",
-            command=lambda _col="diff_rating": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "gen_area",
-            text="General Area",
-            command=lambda _col="gen_area": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-        self.tview_search_results.heading(
-            "dist_from_home",
-            text="Dist from Home",
-            command=lambda _col="dist_from_home": self.treeview_sort(self.tview_search_results, _col, False)
-        )
-
-        self.tview_search_results.bind("<Double-1>", self.on_double_click)
+        self.tview_search_results = HikeTable(frame_search_results_box, self.on_double_click)
 
-        # scrollbar for treeview
-        vsb = ttk.Scrollbar(
-            frame_search_results_box,
-            orient="vertical",
-            command=self.tview_search_results.yview
+        # match count, and a cancel button while a search is still streaming in
+        frame_search_status = tk.Frame(
+            master=self,
+            bg="#1b4760"
+        )
+        frame_search_status.pack(padx=25, pady=(10, 0), fill='x')
+
+        self.lbl_result_count = tk.Label(
+            master=frame_search_status,
+            text="",
+            font=("Comic Book", 12),
+            bg="#1b4760",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0
         )
-        self.tview_search_results.configure(yscrollcommand=vsb.set)
+        self.lbl_result_count.pack(side='left', padx=10, pady=5)
 
-        self.tview_search_results.pack(side='left')
-        vsb.pack(side='right', fill='y')
+        self.btn_cancel = tk.Button(
+            master=frame_search_status,
+            text="Cancel",
+            font=("Comic Book", 12, "bold"),
+            bg="#6a96c6",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            width=10,
+            command=lambda: controller.get_page(Search).cancel_search()
+        )
 
         btn_back = tk.Button(
             master=self,
@@ -831,64 +3998,53 @@ class SearchResults(tk.Frame):
         btn_main.pack(side='right', padx=50)
 
     def on_double_click(self, *args):
-        value = self.tview_search_results.item(self.tview_search_results.focus())
-        selected_hike = []
-        for hike in hike_list:
-            if hike[1] == value['values'][1]:
-                selected_hike = hike
-        pop_up = tk.Toplevel()
-        pop_up.geometry("800x600")
-        pop_up.title(value['values'][1])
-        pop_up.iconbitmap(r"pp.ico")
-        pop_up.resizable(False, False)
-        frame = HikeDetails(pop_up, self, selected_hike)
-        frame.grid_rowconfigure(0, weight=1)
-        frame.pack(expand=True, fill="both")
+        row_id = self.tview_search_results.focused_row()
+        if row_id is not None:
+            show_hike_details(self.controller, hike_index.rows[row_id])
 
     # populate treeview with hikes from search results
     def populate(self):
-        # delete previous results, prep table to receive new results
-        self.tview_search_results.delete(*self.tview_search_results.get_children())
-        id_ = 1
-        for hike in Search.search_results:
-            if hike[9] == 1:
-                complete = "✔"
-            else:
-                complete = " "
-            if hike[5] == 0:
-                prom = "N/A"
-            else:
-                prom = hike[5], "ft"
-            self.tview_search_results.insert(
-                parent='',
-                index='end',
-                iid=id_,
-                text="",
-                values=(complete, hike[1], (hike[2], "miles"), (hike[3], "ft"), (hike[4], "ft"), prom,
-                        hike[6], hike[7], (hike[8], "hours"))
-            )
-            id_ += 1
+        with profiler.span("table.populate", rows=len(Search.search_results)):
+            self.tview_search_results.show(Search.search_results)
+            self.set_count(len(Search.search_results))
+
+    def set_count(self, count, prefix=""):
+        if count == 1:
+            self.lbl_result_count.config(text=prefix + "1 matching hike")
+        else:
+            self.lbl_result_count.config(text=prefix + str(count) + " matching hikes")
 
-    # sort treeview table
-    ''' something funky is going on when sorting ints. need to look into later '''
-    def treeview_sort(self, tv, col, reverse):
-        l = [(tv.set(k, col), k) for k in tv.get_children('')]
-        l.sort(reverse=reverse)
+    # a search started streaming in
+    def start(self):
+        self.tview_search_results.show([])
+        self.btn_cancel.pack(side='right', padx=10, pady=5)
 
-        # rearrange items in sorted positions
-        for index, (val, k), in enumerate(l):
-            tv.move(k, '', index)
+    # more matches arrived, appended without moving the viewport
+    def add(self, row_ids):
+        table = self.tview_search_results
+        table.update_rows(add=row_ids)
+        table.render()
+        self.set_count(len(table.row_ids), "Searching... ")
+
+    # the search is done, show the matches in their final order
+    def finish(self):
+        self.btn_cancel.pack_forget()
+        self.populate()
+
+    # the search was cancelled or failed, keep the matches found so far
+    def stop(self, count, reason="Cancelled, "):
+        self.btn_cancel.pack_forget()
+        self.set_count(count, reason)
 
-        # reverse sort next time
-        tv.heading(col, command=lambda _col=col: self.treeview_sort(tv, _col, not reverse))
 
 
 # view my hikes class
 class MyHikes(tk.Frame):
 
     def __init__(self, parent, controller):
-        self.main_background = ImageTk.PhotoImage(Image.open(r"peak_pro_main_bg.jpg"))
-        self.my_hikes_title = ImageTk.PhotoImage(Image.open(r"my_hikes.png"))
+        self.controller = controller
+        self.main_background = image_cache.get(r"peak_pro_main_bg.jpg")
+        self.my_hikes_title = image_cache.get(r"my_hikes.png")
 
         tk.Frame.__init__(self, parent)
 
@@ -923,107 +4079,16 @@ class MyHikes(tk.Frame):
         ''' would like to figure out how to change table header height... '''
 
         # treeview style
-        self.tview_my_hikes = ttk.Style()
-        self.tview_my_hikes.configure("Treeview.Heading", font=("Comic Book", 10))
-        self.tview_my_hikes = ttk.Style()
-        self.tview_my_hikes.configure("Treeview", font=("Comic Book", 10), rowheight=55)
+        tview_heading_style = ttk.Style()
+        tview_heading_style.configure("Treeview.Heading", font=("Comic Book", 10))
+        tview_style = ttk.Style()
+        tview_style.configure("Treeview", font=("Comic Book", 10), rowheight=55)
 
         # create treeview for search results
-        self.tview_my_hikes = ttk.Treeview(frame_my_hikes_box, style="Custom.Treeview", selectmode="browse")
-        self.tview_my_hikes['columns'] = ('complete', 'name', 'total_distance', 'elev_gain', 'max_elev',
-                                          'prominence', 'diff_rating', 'gen_area', 'dist_from_home')
-        self.tview_my_hikes.column("#0", width=0, minwidth=0)
-        self.tview_my_hikes.column("complete", width=30, minwidth=30, anchor="c")
-        self.tview_my_hikes.column("name", width=200, minwidth=200)
-        self.tview_my_hikes.column("total_distance", width=100, minwidth=100)
-        self.tview_my_hikes.column("elev_gain", width=100, minwidth=100)
-        self.tview_my_hikes.column("max_elev", width=100, minwidth=100)
-        self.tview_my_hikes.column("prominence", width=100, minwidth=100)
-        self.tview_my_hikes.column("diff_rating", width=110, minwidth=110)
-        self.tview_my_hikes.column("gen_area", width=150, minwidth=150)
-        self.tview_my_hikes.column("dist_from_home", width=130, minwidth=130)
-
-        self.tview_my_hikes.heading("#0", text="Label", anchor="w")
-        self.tview_my_hikes.heading(
-            "complete",
-            text="✔",
-            command=lambda _col="complete": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "name",
-            text="Name",
-            command=lambda _col="name": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "total_distance",
-            text="Total Dist",
-            command=lambda _col="total_distance": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "elev_gain",
-            text="Elev Gain",
-            command=lambda _col="elev_gain": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "max_elev",
-            text="Max Elev",
-            command=lambda _col="max_elev": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "prominence",
-            text="Prominence",
-            command=lambda _col="prominence": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "diff_rating",
-            text="Diff Rating",
-            command=lambda _col="diff_rating": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "gen_area",
-            text="General Area",
-            command=lambda _col="gen_area": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-        self.tview_my_hikes.heading(
-            "dist_from_home",
-            text="Dist from Home",
-            command=lambda _col="dist_from_home": self.treeview_sort(self.tview_my_hikes, _col, False)
-        )
-
-        self.tview_my_hikes.bind("<Double-1>", self.on_double_click)
+        self.tview_my_hikes = HikeTable(frame_my_hikes_box, self.on_double_click)
 
-        # scrollbar for treeview
-        vsb = ttk.Scrollbar(
-            frame_my_hikes_box,
-            orient="vertical",
-            command=self.tview_my_hikes.yview
-        )
-        self.tview_my_hikes.configure(yscrollcommand=vsb.set)
-
-        self.tview_my_hikes.pack(side='left')
-        vsb.pack(side='right', fill='y')
-
-        # add search results to treeview
-        id_ = 1
-        for hike in hike_list:
-            if hike[9] == 1:
-                complete = "✔"
-            else:
-                complete = " "
-            if hike[5] == 0:
-                prom = "N/A"
-            else:
-                prom = hike[5], "ft"
-            if hike[10] == 1:
-                self.tview_my_hikes.insert(
-                    parent='',
-                    index='end',
-                    iid=id_,
-                    text="",
-                    values=(complete, hike[1], (hike[2], "miles"), (hike[3], "ft"), (hike[4], "ft"), prom,
-                            hike[6], hike[7], (hike[8], "hours"))
-                )
-            id_ += 1
+        # add my hikes to treeview
+        self.refresh()
 
         btn_main = tk.Button(
             master=self,
@@ -1040,39 +4105,32 @@ class MyHikes(tk.Frame):
         btn_main.pack(side='right', padx=50)
 
     def on_double_click(self, *args):
-        value = self.tview_my_hikes.item(self.tview_my_hikes.focus())
-        selected_hike = []
-        for hike in hike_list:
-            if hike[1] == value['values'][1]:
-                selected_hike = hike
-        pop_up = tk.Toplevel()
-        pop_up.geometry("800x600")
-        pop_up.title(value['values'][1])
-        pop_up.iconbitmap(r"pp.ico")
-        pop_up.resizable(False, False)
-        frame = HikeDetails(pop_up, self, selected_hike)
-        frame.grid_rowconfigure(0, weight=1)
-        frame.pack(expand=True, fill="both")
-
-    # sort treeview table
-    def treeview_sort(self, tv, col, reverse):
-        l = [(tv.set(k, col), k) for k in tv.get_children('')]
-        l.sort(reverse=reverse)
-
-        # rearrange items in sorted positions
-        for index, (val, k), in enumerate(l):
-            tv.move(k, '', index)
+        row_id = self.tview_my_hikes.focused_row()
+        if row_id is not None:
+            show_hike_details(self.controller, hike_index.rows[row_id])
+
+    def refresh(self):
+        self.tview_my_hikes.show([row_id for row_id in hike_index.live_ids() if hike_index.rows[row_id].my_hike == 1])
+
+    # keep the table in step with synced changes, an updated hike keeps its place unless it left or joined my hikes
+    def on_changes(self, added, updated, removed):
+        rows = hike_index.rows
+        shown = set(self.tview_my_hikes.row_ids) if updated else ()
+        self.tview_my_hikes.update_rows(
+            add=[row_id for row_id in added if rows[row_id].my_hike == 1] +
+                [row_id for row_id in updated if rows[row_id].my_hike == 1 and row_id not in shown],
+            remove=removed + [row_id for row_id in updated if rows[row_id].my_hike != 1]
+        )
 
-        # reverse sort next time
-        tv.heading(col, command=lambda _col=col: self.treeview_sort(tv, _col, not reverse))
 
 
 # search results class
 class AllHikes(tk.Frame):
 
     def __init__(self, parent, controller):
-        self.main_background = ImageTk.PhotoImage(Image.open(r"peak_pro_main_bg.jpg"))
-        self.all_hikes_title = ImageTk.PhotoImage(Image.open(r"all_hikes.png"))
+        self.controller = controller
+        self.main_background = image_cache.get(r"peak_pro_main_bg.jpg")
+        self.all_hikes_title = image_cache.get(r"all_hikes.png")
 
         tk.Frame.__init__(self, parent)
 
@@ -1128,100 +4186,10 @@ class AllHikes(tk.Frame):
                   relief=[('active', 'groove'), ('pressed', 'sunken')])
 
         # create treeview for search results
-        self.tview_all_hikes = ttk.Treeview(frame_all_hikes_box, style="Custom.Treeview", selectmode="browse")
-        self.tview_all_hikes['columns'] = ('complete', 'name', 'total_distance', 'elev_gain', 'max_elev',
-                                           'prominence', 'diff_rating', 'gen_area', 'dist_from_home')
-        self.tview_all_hikes.column("#0", width=0, minwidth=0)
-        self.tview_all_hikes.column("complete", width=30, minwidth=30, anchor="c")
-        self.tview_all_hikes.column("name", width=200, minwidth=200)
-        self.tview_all_hikes.column("total_distance", width=100, minwidth=100)
-        self.tview_all_hikes.column("elev_gain", width=100, minwidth=100)
-        self.tview_all_hikes.column("max_elev", width=100, minwidth=100)
-        self.tview_all_hikes.column("prominence", width=100, minwidth=100)
-        self.tview_all_hikes.column("diff_rating", width=110, minwidth=110)
-        self.tview_all_hikes.column("gen_area", width=150, minwidth=150)
-        self.tview_all_hikes.column("dist_from_home", width=130, minwidth=130)
-
-        self.tview_all_hikes.heading("#0", text="Label", anchor="w")
-        self.tview_all_hikes.heading(
-            "complete",
-            text="✔",
-            command=lambda _col="complete": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "name",
-            text="Name",
-            command=lambda _col="name": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "total_distance",
-            text="Total Dist",
-            command=lambda _col="total_distance": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "elev_gain",
-            text="Elev Gain",
-            command=lambda _col="elev_gain": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "max_elev",
-            text="Max Elev",
-            command=lambda _col="max_elev": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "prominence",
-            text="Prominence",
-            command=lambda _col="prominence": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "diff_rating",
-            text="Diff Rating",
-            command=lambda _col="diff_rating": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "gen_area",
-            text="General Area",
-            command=lambda _col="gen_area": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-        self.tview_all_hikes.heading(
-            "dist_from_home",
-            text="Dist from Home",
-            command=lambda _col="dist_from_home": self.treeview_sort(self.tview_all_hikes, _col, False)
-        )
-
-        self.tview_all_hikes.bind("<Double-1>", self.on_double_click)
-
-        # scrollbar for treeview
-        vsb = ttk.Scrollbar(
-            frame_all_hikes_box,
-            orient="vertical",
-            command=self.tview_all_hikes.yview
-        )
-        self.tview_all_hikes.configure(yscrollcommand=vsb.set)
-
-        self.tview_all_hikes.pack(side='left')
-        vsb.pack(side='right', fill='y')
+        self.tview_all_hikes = HikeTable(frame_all_hikes_box, self.on_double_click)
 
         # add all hikes to treeview
-        id_ = 1
-        for hike in hike_list:
-            if hike[9] == 1:
-                complete = "✔"
-            else:
-                complete = " "
-            if hike[5] == 0:
-                prom = "N/A"
-            else:
-                prom = hike[5], "ft"
-            self.tview_all_hikes.insert(
-                parent='',
-                index='end',
-                iid=id_,
-                text="",
-                values=(complete, hike[1], (hike[2], "miles"), (hike[3], "ft"), (hike[4], "ft"), prom,
-                        hike[6], hike[7], (hike[8], "hours"))
-            )
-            id_ += 1
+        self.refresh()
 
         btn_main = tk.Button(
             master=self,
@@ -1237,32 +4205,232 @@ class AllHikes(tk.Frame):
         )
         btn_main.pack(side='right', padx=50)
 
+        btn_import = tk.Button(
+            master=self,
+            text="Import Hikes",
+            font=("Comic Book", 17, "bold"),
+            bg="#1b4760",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            width=18,
+            height=2,
+            command=self.import_file
+        )
+        btn_import.pack(side='left', padx=50)
+
     def on_double_click(self, *args):
-        value = self.tview_all_hikes.item(self.tview_all_hikes.focus())
-        selected_hike = []
-        for hike in hike_list:
-            if hike[1] == value['values'][1]:
-                selected_hike = hike
-        pop_up = tk.Toplevel()
-        pop_up.geometry("800x600")
-        pop_up.title(value['values'][1])
-        pop_up.iconbitmap(r"pp.ico")
-        pop_up.resizable(False, False)
-        frame = HikeDetails(pop_up, self, selected_hike)
-        frame.grid_rowconfigure(0, weight=1)
-        frame.pack(expand=True, fill="both")
-
-    # sort treeview table
-    def treeview_sort(self, tv, col, reverse):
-        l = [(tv.set(k, col), k) for k in tv.get_children('')]
-        l.sort(reverse=reverse)
-
-        # rearrange items in sorted positions
-        for index, (val, k), in enumerate(l):
-            tv.move(k, '', index)
+        row_id = self.tview_all_hikes.focused_row()
+        if row_id is not None:
+            show_hike_details(self.controller, hike_index.rows[row_id])
+
+    def refresh(self):
+        self.tview_all_hikes.show(hike_index.live_ids())
+
+    def on_changes(self, added, updated, removed):
+        self.tview_all_hikes.update_rows(add=added, remove=removed)
+
+    def import_file(self):
+        if not self.controller.catalog_ready:
+            return
+        if storage.read_only:
+            messagebox.showinfo("Read Only", "This catalog is read-only, so hikes can't be imported into it.")
+            return
+        path = filedialog.askopenfilename(
+            title="Import Hikes",
+            filetypes=[("Trail files", "*.csv *.gpx *.geojson *.json"), ("All files", "*.*")]
+        )
+        if path:
+            self.controller.start_import(path)
 
-        # reverse sort next time
-        tv.heading(col, command=lambda _col=col: self.treeview_sort(tv, _col, not reverse))
+
+
+# open the pop up for setting the home location
+def show_home_location(controller):
+    pop_up = tk.Toplevel()
+    pop_up.title("Home Location")
+    pop_up.iconbitmap(r"pp.ico")
+    pop_up.resizable(False, False)
+    frame = HomeLocation(pop_up, controller)
+    frame.pack(expand=True, fill="both")
+
+
+# pop up class for the home location trailhead distances are measured from
+class HomeLocation(tk.Frame):
+
+    def __init__(self, parent, controller):
+        self.parent = parent
+        self.controller = controller
+        tk.Frame.__init__(self, parent, bg="#6a96c6", padx=25, pady=20)
+
+        lbl_home = tk.Label(
+            master=self,
+            text="Home latitude and longitude",
+            font=("Comic Book", 15, "bold"),
+            bg="#6a96c6",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0
+        ).grid(column=0, row=0, columnspan=2, pady=(0, 15))
+
+        self.ent_lat = tk.Entry(
+            master=self,
+            width=12,
+            font=("Comic Book", 15),
+            borderwidth=4,
+            relief=tk.FLAT
+        )
+        self.ent_lat.insert(0, str(hike_index.home[0]))
+        self.ent_lat.grid(column=0, row=1, padx=(0, 10))
+
+        self.ent_lon = tk.Entry(
+            master=self,
+            width=12,
+            font=("Comic Book", 15),
+            borderwidth=4,
+            relief=tk.FLAT
+        )
+        self.ent_lon.insert(0, str(hike_index.home[1]))
+        self.ent_lon.grid(column=1, row=1)
+
+        btn_save = tk.Button(
+            master=self,
+            text="Save",
+            font=("Comic Book", 15, "bold"),
+            bg="#1b4760",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            width=12,
+            command=self.save
+        ).grid(column=0, row=2, columnspan=2, pady=(15, 0))
+
+    # remember the new home and re-measure every trailhead from it
+    def save(self):
+        try:
+            home = (float(self.ent_lat.get()), float(self.ent_lon.get()))
+        except ValueError:
+            messagebox.showerror("Invalid Location", "Please enter the latitude and longitude as numbers.")
+            return
+        if not (-90 <= home[0] <= 90 and -180 <= home[1] <= 180):
+            messagebox.showerror("Invalid Location", "Latitude must be between -90 and 90 and longitude between "
+                                                     "-180 and 180.")
+            return
+        settings = load_settings()
+        settings["home"] = list(home)
+        save_settings(settings)
+        hike_index.set_home(home)
+        HikeTable.render_all()
+        if self.controller.catalog_ready:
+            self.controller.route_trailheads()
+        self.parent.destroy()
+
+
+# open the profiler's debug overlay (F12 with --profile), returning its window
+def show_profiler_overlay():
+    pop_up = tk.Toplevel()
+    pop_up.title("Profiler")
+    pop_up.iconbitmap(r"pp.ico")
+    pop_up.attributes("-topmost", True)
+    frame = ProfilerOverlay(pop_up)
+    frame.pack(expand=True, fill="both")
+    return pop_up
+
+
+# pop up listing the latest timed spans and the event loop's latency, refreshed while it's open
+class ProfilerOverlay(tk.Frame):
+
+    def __init__(self, parent):
+        tk.Frame.__init__(self, parent, bg="#6a96c6", padx=15, pady=10)
+
+        self.lbl_latency = tk.Label(
+            master=self,
+            font=("Comic Book", 13, "bold"),
+            bg="#6a96c6",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0
+        )
+        self.lbl_latency.grid(column=0, row=0, columnspan=2, sticky="w", pady=(0, 10))
+
+        self.lbl_spans = tk.Label(
+            master=self,
+            font=("Courier", 11),
+            bg="#6a96c6",
+            fg="white",
+            justify=tk.LEFT,
+            anchor="nw",
+            width=56,
+            height=PROFILE_OVERLAY_ROWS
+        )
+        self.lbl_spans.grid(column=0, row=1, columnspan=2, sticky="w")
+
+        btn_json = tk.Button(
+            master=self,
+            text="Export JSON",
+            font=("Comic Book", 12, "bold"),
+            bg="#1b4760",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            width=16,
+            command=lambda: self.export(False)
+        ).grid(column=0, row=2, pady=(10, 0))
+
+        btn_chrome = tk.Button(
+            master=self,
+            text="Export Chrome Trace",
+            font=("Comic Book", 12, "bold"),
+            bg="#1b4760",
+            fg="white",
+            borderwidth=0,
+            highlightthickness=0,
+            width=16,
+            command=lambda: self.export(True)
+        ).grid(column=1, row=2, pady=(10, 0))
+
+        self.refresh()
+
+    def refresh(self):
+        latencies = sorted(event[3] * 1000 for event in profiler.latest("sample", 600) if event[1] == "tk.latency")
+        if latencies:
+            self.lbl_latency.config(text="Event loop latency  p50 %.1f ms   p95 %.1f ms   max %.1f ms" % (
+                latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], latencies[-1]))
+        else:
+            self.lbl_latency.config(text="Event loop latency  -")
+        lines = []
+        for kind, name, start, seconds, thread, args in profiler.latest("span", PROFILE_OVERLAY_ROWS):
+            detail = " ".join("%s=%s" % item for item in sorted(args.items()))
+            lines.append(("%-16s %9.2f ms  %s" % (name, seconds * 1000, detail))[:56])
+        self.lbl_spans.config(text="\n".join(lines))
+        self.after(PROFILE_OVERLAY_REFRESH, self.refresh)
+
+    def export(self, chrome):
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Export Profile",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            profiler.export(path, chrome)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e), parent=self)
+
+
+# open the details pop up for a hike
+def show_hike_details(controller, hike):
+    pop_up = tk.Toplevel()
+    pop_up.geometry("800x600")
+    pop_up.title(hike.name)
+    pop_up.iconbitmap(r"pp.ico")
+    pop_up.resizable(False, False)
+    with profiler.span("details", hike=hike.id):
+        frame = HikeDetails(pop_up, controller, hike)
+    frame.grid_rowconfigure(0, weight=1)
+    frame.pack(expand=True, fill="both")
 
 
 # pop up class for hike details
@@ -1270,8 +4438,8 @@ class HikeDetails(tk.Frame):
 
     def __init__(self, parent, controller, hike_):
 
-        self.details_bg = ImageTk.PhotoImage(Image.open(r"hike_details_bg.jpg"))
-        self.hike_photo = ImageTk.PhotoImage(Image.open(r"summit_photo.jpg"))
+        self.details_bg = image_cache.get(r"hike_details_bg.jpg")
+        self.hike_photo = image_cache.get(r"summit_photo.jpg")
         self.hike_ = hike_
 
         tk.Frame.__init__(self, parent)
@@ -1286,7 +4454,7 @@ class HikeDetails(tk.Frame):
 
         lbl_hike_title = tk.Label(
             master=self,
-            text=hike_[1],
+            text=hike_.name,
             font=("Comic Book", 36, "bold"),
             bg="#c6c2dd",
             fg="#103448",
@@ -1296,7 +4464,7 @@ class HikeDetails(tk.Frame):
 
         lbl_area = tk.Label(
             master=self,
-            text=hike_[7],
+            text=hike_.area,
             font=("Comic Book", 18, "bold"),
             bg="#c6c2dd",
             fg="#103448",
@@ -1306,7 +4474,7 @@ class HikeDetails(tk.Frame):
 
         lbl_distance_from_home = tk.Label(
             master=self,
-            text=(str(hike_[8]) + " hours from Tacoma"),
+            text=self.distance_from_home(),
             font=("Comic Book", 18, "bold"),
             bg="#c6c2dd",
             fg="#103448",
@@ -1332,7 +4500,7 @@ class HikeDetails(tk.Frame):
 
         lbl_total_distance = tk.Label(
             master=frame_hike_info_details,
-            text=("Total Distance: " + str(hike_[2]) + " miles"),
+            text=("Total Distance: " + str(hike_.distance) + " miles"),
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
@@ -1342,7 +4510,7 @@ class HikeDetails(tk.Frame):
 
         lbl_elev_change = tk.Label(
             master=frame_hike_info_details,
-            text=("Elevation Gain: " + str(hike_[3]) + " ft"),
+            text=("Elevation Gain: " + str(hike_.elev_gain) + " ft"),
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
@@ -1352,7 +4520,7 @@ class HikeDetails(tk.Frame):
 
         lbl_max_elev = tk.Label(
             master=frame_hike_info_details,
-            text=("Max Elevation: " + str(hike_[4]) + " ft"),
+            text=("Max Elevation: " + str(hike_.max_elev) + " ft"),
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
@@ -1362,7 +4530,7 @@ class HikeDetails(tk.Frame):
 
         lbl_prom = tk.Label(
             master=frame_hike_info_details,
-            text=("Prominence: " + str(hike_[5]) + " ft"),
+            text=("Prominence: " + str(hike_.prominence) + " ft"),
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
@@ -1372,7 +4540,7 @@ class HikeDetails(tk.Frame):
 
         lbl_diff_rating = tk.Label(
             master=frame_hike_info_details,
-            text=("Difficulty Rating: " + hike_[6]),
+            text=("Difficulty Rating: %s (%.1f)" % (hike_.difficulty.label, hike_.difficulty_score)),
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
@@ -1393,11 +4561,7 @@ class HikeDetails(tk.Frame):
         lbl_trailhead_link.grid(column=0, row=5, sticky="w", padx=(10, 0))
         lbl_trailhead_link.bind(
             "<Button-1>",
-            lambda e: self.callback(
-                "https://www.google.com/maps/place/Mt.+Si+Trailhead/@47.4891732,-121.7355853,14.25z/data=!4m13!1m7!3m6!"
-                "1s0x54907e8ab5b8fa19:0xc5df1f9a8d23f99!2sMount+Si+Trail,+Washington+98045!3b1!8m2!3d47.4970068!4d-121."
-                "731891!3m4!1s0x54907e67c323cddd:0xc8541391393bdc7d!8m2!3d47.4880423!4d-121.7231619!5m1!1e4"
-            )
+            lambda e: self.callback(self.hike_.maps_url())
         )
 
         lbl_notes = tk.Label(
@@ -1410,7 +4574,7 @@ class HikeDetails(tk.Frame):
             highlightthickness=0,
         ).grid(column=0, row=6, sticky="w", padx=(10, 0))
 
-        txt_notes = tk.Text(
+        self.txt_notes = tk.Text(
             master=frame_hike_info_details,
             font=("Comic Book", 11, "bold"),
             bg="white",
@@ -1418,7 +4582,12 @@ class HikeDetails(tk.Frame):
             height=4,
             width=22
         )
-        txt_notes.grid(column=0, row=7, sticky="w", padx=(10, 0))
+        if notes_loaded:
+            self.txt_notes.insert("1.0", hike_notes.get(hike_.id, ""))
+        else:
+            self.txt_notes.insert("1.0", "Notes can't be loaded offline")
+            self.txt_notes.config(state="disabled")
+        self.txt_notes.grid(column=0, row=7, sticky="w", padx=(10, 0))
 
         frame_hike_complete = tk.Frame(
             master=frame_hike_info_details,
@@ -1436,14 +4605,14 @@ class HikeDetails(tk.Frame):
             highlightthickness=0
         ).grid(column=0, row=0, sticky="w")
 
-        complete_val = tk.IntVar()
+        self.complete_val = tk.IntVar(value=hike_.complete)
         tk.Radiobutton(
             master=frame_hike_complete,
             font=("Comic Book", 14, "bold"),
             bg="white",
             fg="#103448",
             text="Yes",
-            variable=complete_val,
+            variable=self.complete_val,
             value=1
         ).grid(column=1, row=0)
 
@@ -1453,7 +4622,7 @@ class HikeDetails(tk.Frame):
             bg="white",
             fg="#103448",
             text="No",
-            variable=complete_val,
+            variable=self.complete_val,
             value=0
         ).grid(column=2, row=0)
 
@@ -1483,7 +4652,7 @@ class HikeDetails(tk.Frame):
             highlightthickness=0
         ).grid(column=1, row=0, sticky="e", padx=(24, 15), pady=(15, 0))
 
-        lbl_summit_photo_caption = tk.Label(
+        self.lbl_summit_photo_caption = tk.Label(
             master=frame_hike_photo,
             text="[Placeholder image caption]",
             font=("Comic Book", 12, "bold"),
@@ -1491,20 +4660,148 @@ class HikeDetails(tk.Frame):
             fg="#103448",
             borderwidth=0,
             highlightthickness=0
+        )
+        self.lbl_summit_photo_caption.grid(column=1, row=1, sticky="ew")
+
+        # elevation profile from the hike's recorded track, if there is one. the first look at a track parses the
+        # whole GPX file, so it's read in the background and replaces the caption when it arrives
+        self.frame_hike_photo = frame_hike_photo
+        threading.Thread(
+            target=lambda: controller.background_messages.put(("track_profile", self, track_analysis(hike_.id))),
+            daemon=True
+        ).start()
+
+    def show_profile(self, analysis):
+        if analysis is None or analysis.profile is None:
+            return
+        self.lbl_summit_photo_caption.destroy()
+        lbl_profile = tk.Label(
+            master=self.frame_hike_photo,
+            text="Elevation Profile (steepest %.0f%%)" % analysis.steepest,
+            font=("Comic Book", 12, "bold"),
+            bg="white",
+            fg="#103448",
+            borderwidth=0,
+            highlightthickness=0
         ).grid(column=1, row=1, sticky="ew")
 
+        canvas_profile = tk.Canvas(
+            master=self.frame_hike_photo,
+            width=360,
+            height=110,
+            bg="white",
+            borderwidth=0,
+            highlightthickness=0
+        )
+        canvas_profile.grid(column=1, row=2, padx=(24, 15))
+        self.draw_profile(canvas_profile, analysis.profile, 360, 110)
+
     def callback(self, url):
         webbrowser.open_new(url)
 
+    # filled elevation profile, labelled with the low and high points in feet and the length in miles
+    @staticmethod
+    def draw_profile(canvas, profile, width, height):
+        left, bottom = 45, height - 15
+        km = profile[-1][0] - profile[0][0]
+        low = min(elevation for x, elevation in profile)
+        high = max(elevation for x, elevation in profile)
+        rise = high - low or 1.0
+        points = [(left, bottom)]
+        for x, elevation in profile:
+            points.append((left + (x - profile[0][0]) / (km or 1.0) * (width - left - 5),
+                           bottom - (elevation - low) / rise * (bottom - 10)))
+        points.append((width - 5, bottom))
+        canvas.create_polygon(points, fill="#c6c2dd", outline="#103448", width=2)
+        canvas.create_text(left - 5, 10, text="%d ft" % (high * FEET_PER_METER), anchor="e",
+                           font=("Comic Book", 8), fill="#103448")
+        canvas.create_text(left - 5, bottom, text="%d ft" % (low * FEET_PER_METER), anchor="e",
+                           font=("Comic Book", 8), fill="#103448")
+        canvas.create_text(width - 5, height, text="%.1f mi" % (km / KM_PER_MILE), anchor="se",
+                           font=("Comic Book", 8), fill="#103448")
+
+    def distance_from_home(self):
+        if self.hike_.lat is None:
+            if self.hike_.hours_from_home == math.inf:
+                return "Distance from home unknown"
+            return str(self.hike_.hours_from_home) + " hours from Tacoma"
+        text = "%.0f km from home" % haversine_km(self.hike_.lat, self.hike_.lon, *hike_index.home)
+        if self.hike_.id in hike_index.drive_times:
+            text += ", %.1f hours drive" % hike_index.drive_times[self.hike_.id]
+        return text
+
+    # update the catalog and tables right away, the database write is queued. the edit goes on the catalog's current
+    # copy of the hike, which a sync or import may have changed since the pop up opened
     def save(self):
-        messagebox.showinfo("Success", "Notes and completion status saved!")
-
-
-app = MainApp()
-app.geometry("1100x700")
-app.title("Summit Register")
-app.iconbitmap(r"pp.ico")
-app.resizable(False, False)
-app.grid_columnconfigure(0, weight=1)
-app.grid_rowconfigure(0, weight=1)
-app.mainloop()
+        notes = self.txt_notes.get("1.0", "end-1c") if notes_loaded else None
+        complete = self.complete_val.get()
+        hike = hike_index.get(self.hike_.id)
+        if hike is None:
+            messagebox.showerror("Hike Removed", "This hike has been removed from the catalog.")
+            return
+        self.hike_ = hike.replace(complete=complete)
+        hike_index.upsert(self.hike_)
+        if notes is not None:
+            hike_notes[self.hike_.id] = notes
+        HikeTable.render_all()
+        if storage.read_only:
+            messagebox.showinfo("Read Only", "This catalog is read-only. Changes are kept until the app is closed.")
+        elif notes is None:
+            hike_writer.save(self.hike_.id, notes, complete)
+            messagebox.showinfo("Success", "Completion status saved! Notes can't be edited offline.")
+        else:
+            hike_writer.save(self.hike_.id, notes, complete)
+            messagebox.showinfo("Success", "Notes and completion status saved!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summit Register hiking tracker")
+    parser.add_argument("--storage", default="mysql",
+                        help='"mysql" (default), a SQLite database file, or a read-only .snapshot file')
+    parser.add_argument("--export", metavar="PATH",
+                        help="copy the catalog into a SQLite database or .snapshot file and exit")
+    parser.add_argument("--import", dest="import_path", metavar="PATH",
+                        help="add or update hikes from a CSV, GPX or GeoJSON trail file and exit")
+    parser.add_argument("--analyze-tracks", nargs="?", const=TRACKS_DIR, metavar="DIR",
+                        help="measure distance, gain and max elevation from the <hike id>.gpx tracks in DIR "
+                             "(default %s), write them to the catalog and exit" % TRACKS_DIR)
+    parser.add_argument("--profile", action="store_true",
+                        help="time loading, searching, sorting and pop ups and sample the event loop's latency; "
+                             "F12 shows the latest timings")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="write the profile to PATH on exit (implies --profile)")
+    parser.add_argument("--profile-format", choices=("chrome", "json"), default="chrome",
+                        help='"chrome" (default) for chrome://tracing or Perfetto, or "json"')
+    args = parser.parse_args()
+    profiler.enabled = args.profile or bool(args.profile_out)
+    storage = open_storage(args.storage)
+
+    if args.export:
+        export_catalog(open_storage(args.export))
+        raise SystemExit
+
+    if args.import_path:
+        try:
+            import_catalog(args.import_path)
+        except (HikeImportError, StorageError) as e:
+            raise SystemExit("\nImport failed: " + str(e))
+        raise SystemExit
+
+    if args.analyze_tracks:
+        try:
+            analyze_catalog_tracks(args.analyze_tracks)
+        except (OSError, StorageError) as e:
+            raise SystemExit("Track analysis failed: " + str(e))
+        raise SystemExit
+
+    app = MainApp()
+    app.geometry("1100x700")
+    app.title("Summit Register")
+    app.iconbitmap(r"pp.ico")
+    app.resizable(False, False)
+    app.grid_columnconfigure(0, weight=1)
+    app.grid_rowconfigure(0, weight=1)
+    app.mainloop()
+
+    if args.profile_out:
+        profiler.export(args.profile_out, args.profile_format == "chrome")
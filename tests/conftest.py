@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+AREAS = ("Snoqualmie Pass", "Mt Rainier", "North Cascades", "Olympics", "Issaquah Alps")
+FEATURES = ("Lake", "Peak", "Ridge", "Falls", "Lookout")
+KEYWORDS = ("waterfall", "views", "rain forest", "alpine lake", "dog friendly")
+
+
+# hikes table rows in HIKE_COLUMNS order, some without a trailhead, prominence or keywords
+def make_rows(count, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for hike_id in range(1, count + 1):
+        if rng.random() < 0.1:
+            lat = lon = None
+        else:
+            lat, lon = round(rng.uniform(45.5, 49), 5), round(rng.uniform(-124, -117), 5)
+        rows.append((
+            hike_id,
+            "%s %s %d" % (rng.choice(FEATURES), rng.choice(("Trail", "Loop")), hike_id),
+            round(rng.uniform(0.5, 20), 1),
+            rng.randint(0, 6000),
+            rng.randint(500, 10000),
+            rng.choice((None, 0, rng.randint(100, 3000))),
+            "Moderate",
+            rng.choice(AREAS),
+            round(rng.uniform(0.3, 4), 1),
+            rng.randint(0, 1),
+            rng.randint(0, 1),
+            rng.choice((None, "", rng.choice(KEYWORDS))),
+            lat,
+            lon,
+        ))
+    return rows
+
+
+@pytest.fixture
+def rows():
+    return make_rows(500)
+
+
+# a SQLite catalog in a temporary directory, used as the app's storage for the test
+@pytest.fixture
+def sqlite_storage(tmp_path, monkeypatch):
+    storage = main.SQLiteStorage(str(tmp_path / "hikes.db"))
+    storage.prepare()
+    monkeypatch.setattr(main, "storage", storage)
+    return storage
@@ -0,0 +1,152 @@
+import contextlib
+import threading
+import types
+
+import mysql.connector
+import pytest
+
+import main
+
+
+class FakeConnection:
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.ping_failures = pool.ping_failures
+
+    def ping(self, reconnect=False):
+        if self.ping_failures:
+            self.ping_failures -= 1
+            raise mysql.connector.errors.InterfaceError("server has gone away")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        with self.pool.lock:
+            self.pool.in_use -= 1
+
+
+# stands in for mysql.connector's pool: hands out up to pool_size connections and raises PoolError past that
+class FakePool:
+
+    created = []
+
+    def __init__(self, pool_size, ping_failures=0, **config):
+        self.pool_size = pool_size
+        self.ping_failures = ping_failures
+        self.in_use = 0
+        self.most_in_use = 0
+        self.lock = threading.Lock()
+        FakePool.created.append(self)
+
+    def get_connection(self):
+        with self.lock:
+            if self.in_use == self.pool_size:
+                raise mysql.connector.errors.PoolError("pool exhausted")
+            self.in_use += 1
+            self.most_in_use = max(self.most_in_use, self.in_use)
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(main.time, "sleep", slept.append)
+    FakePool.created.clear()
+    return slept
+
+
+def test_connection_reconnects_with_backoff(monkeypatch, sleeps):
+    monkeypatch.setattr(mysql.connector.pooling, "MySQLConnectionPool", FakePool)
+    database = main.Database({"ping_failures": 2})
+    with database.connection() as connection:
+        assert connection.ping_failures == 0
+    assert sleeps == [main.DB_RETRY_DELAY, main.DB_RETRY_DELAY * 2]
+    assert FakePool.created[0].in_use == 0
+
+
+def test_pool_creation_retries(monkeypatch, sleeps):
+    attempts = []
+
+    def flaky_pool(**config):
+        attempts.append(config)
+        if len(attempts) < 3:
+            raise mysql.connector.errors.InterfaceError("can't connect")
+        return FakePool(**config)
+
+    monkeypatch.setattr(mysql.connector.pooling, "MySQLConnectionPool", flaky_pool)
+    with main.Database({}).connection():
+        pass
+    assert len(attempts) == 3
+    assert len(sleeps) == 2
+
+
+def test_connection_gives_up(monkeypatch, sleeps):
+    monkeypatch.setattr(mysql.connector.pooling, "MySQLConnectionPool", FakePool)
+    database = main.Database({"ping_failures": 10})
+    with pytest.raises(mysql.connector.Error):
+        with database.connection(retries=1):
+            pass
+    assert FakePool.created[0].in_use == 0
+
+
+def test_threads_borrow_their_own_connections(monkeypatch):
+    monkeypatch.setattr(mysql.connector.pooling, "MySQLConnectionPool", FakePool)
+    database = main.Database({}, pool_size=3)
+    borrowed = []
+    barrier = threading.Barrier(3)
+
+    def borrow():
+        with database.connection() as connection:
+            borrowed.append(connection)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=borrow) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(connection) for connection in borrowed}) == 3
+    assert database.pool.most_in_use == 3
+    assert database.pool.in_use == 0
+
+
+class FakeCursor:
+
+    def __init__(self, denied):
+        self.denied = denied
+        self.result = []
+
+    def execute(self, statement, params=None):
+        if statement.startswith(self.denied):
+            raise mysql.connector.errors.ProgrammingError("TRIGGER command denied")
+        self.result = [("1970-01-01 00:00:01",)] if statement.startswith("SELECT CAST") else []
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+
+    def __init__(self, denied):
+        self.denied = denied
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield types.SimpleNamespace(cursor=lambda: FakeCursor(self.denied))
+
+
+@pytest.mark.parametrize("denied, tracked", [("CREATE TRIGGER", False), ("no statement", True)])
+def test_high_water_needs_the_change_log(monkeypatch, denied, tracked):
+    storage = main.MySQLStorage({})
+    storage.database = FakeDatabase(denied)
+    monkeypatch.setattr(storage, "refresh_difficulty_scores", lambda: None)
+    storage.prepare()
+    assert (storage.high_water() is not None) == tracked
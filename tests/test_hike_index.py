@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+import main
+from conftest import make_rows
+
+COLUMNS = ("distance", "elev_gain", "max_elev", "difficulty_score", "hours_from_home")
+
+
+def brute_force(index, query):
+    matched = []
+    for row_id in index.live_ids():
+        hike = index.rows[row_id]
+        text = "\n".join((hike.name, hike.area, hike.keywords)).lower()
+        if query.keyword and query.keyword not in text:
+            continue
+        if all(main.in_range(index.data[column][row_id] if column == "km_from_home" else getattr(hike, column),
+                             low, high) for column, low, high in query.ranges):
+            matched.append(row_id)
+    return matched
+
+
+def random_query(rng, index):
+    ranges = []
+    for column in rng.sample(COLUMNS + ("km_from_home",), rng.randint(0, 3)):
+        values = sorted(index.data[column])
+        low, high = sorted(rng.sample(values, 2))
+        ranges.append(rng.choice(((column, low, None), (column, None, high), (column, low, high))))
+    keyword = rng.choice(("", "", "lake", "lo", "trail 1", "olympics", "views"))
+    return main.HikeQuery(keyword, tuple(ranges))
+
+
+@pytest.fixture(params=[0, 200, 500])
+def index(rows, request):
+    index = main.HikeIndex([main.Hike.from_row(row) for row in rows])
+    index.text_index.build(request.param)
+    return index
+
+
+def test_search_matches_brute_force(index):
+    rng = random.Random(3)
+    for _ in range(300):
+        query = random_query(rng, index)
+        found = index.search(query)
+        expected = brute_force(index, query)
+        if query.keyword:
+            assert sorted(found) == expected
+        else:
+            assert found == expected
+
+
+@pytest.mark.parametrize("column", sorted(main.HikeIndex.sort_columns))
+def test_sort_rows(index, column):
+    source = index.sort_columns[column]
+    key = (lambda row_id: getattr(index.rows[row_id], source).lower()) if source in index.text_fields \
+        else index.data[source].__getitem__
+    subset = list(range(0, len(index), 3))
+    for row_ids in (list(index.live_ids()), subset):
+        assert [key(row_id) for row_id in index.sort_rows(column, row_ids)] == sorted(map(key, row_ids))
+
+
+def test_search_after_sync(index):
+    rng = random.Random(4)
+    changed = [main.Hike.from_row(row) for row in make_rows(40, seed=9)]
+    for hike in changed:
+        hike.id = rng.randint(1, 600)  # updates existing hikes and adds new ones
+    deleted = rng.sample(range(1, 500), 30)
+    index.sync({hike.id: hike for hike in changed}.values(), deleted)
+    for _ in range(100):
+        query = random_query(rng, index)
+        assert sorted(index.search(query)) == brute_force(index, query)
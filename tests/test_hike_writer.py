@@ -0,0 +1,41 @@
+import os
+
+import main
+from conftest import make_rows
+
+
+class Offline:
+
+    read_only = False
+
+    def save_edits(self, edits):
+        raise main.StorageError("database unreachable")
+
+
+# a writer that only flushes when the test calls flush
+def writer():
+    writer = main.HikeWriter()
+    writer.thread = object()
+    return writer
+
+
+def test_unsent_edits_are_resent_next_start(sqlite_storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PENDING_EDITS_FILE", str(tmp_path / "pending_edits.json"))
+    rows = make_rows(3)
+    sqlite_storage.write_hikes(rows)
+    sqlite_storage.save_edits({1: ("kept", 0)})
+
+    monkeypatch.setattr(main, "storage", Offline())
+    closing = writer()
+    closing.save(1, None, 1)
+    closing.save(2, "new notes", 1)
+    assert not closing.flush()
+    closing.save_pending()
+
+    monkeypatch.setattr(main, "storage", sqlite_storage)
+    starting = writer()
+    assert starting.resume() == {1: (None, 1), 2: ("new notes", 1)}
+    assert starting.flush()
+    assert not os.path.exists(main.PENDING_EDITS_FILE)
+    assert sqlite_storage.load_notes() == {1: "kept", 2: "new notes"}
+    assert [row[9] for batch in sqlite_storage.iter_hikes(10) for row in batch][:2] == [1, 1]
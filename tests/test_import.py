@@ -0,0 +1,61 @@
+import pytest
+
+import main
+
+
+def test_import_row_defaults():
+    row = main.import_row({"name": " Lake Trail ", "total_distance": "3.5"})
+    assert row[0] is None
+    assert row[1] == "Lake Trail"
+    assert row[2] == 3.5
+    assert row[8] is None  # no trailhead to measure hours from home from
+    assert row[12:] == (None, None)
+
+
+def test_import_row_measures_hours_from_trailhead():
+    row = main.import_row({"id": "7", "name": "A", "total_distance": "1", "trailhead_lat": "47.5",
+                           "trailhead_lon": "-121.5"})
+    assert row[0] == 7
+    assert row[8] > 0
+    assert row[12:] == (47.5, -121.5)
+
+
+@pytest.mark.parametrize("fields, reason", [
+    ({"total_distance": "1"}, "missing name"),
+    ({"name": "A"}, "missing total_distance"),
+    ({"name": "A", "total_distance": "far"}, "not a number"),
+    ({"name": "A", "total_distance": "-1"}, "out of range"),
+    ({"name": "A", "total_distance": "1", "elev_gain": "10.5"}, "not a whole number"),
+    ({"name": "A", "total_distance": "1", "trailhead_lat": "47"}, "both latitude and longitude"),
+    ({"name": "A", "total_distance": "1", "trailhead_lat": "91", "trailhead_lon": "0"}, "out of range"),
+    ({"name": "A" * 256, "total_distance": "1"}, "longer than 255"),
+])
+def test_import_row_rejects(fields, reason):
+    with pytest.raises(ValueError, match=reason):
+        main.import_row(fields)
+
+
+def test_import_csv_twice_updates(sqlite_storage, tmp_path):
+    path = tmp_path / "hikes.csv"
+    path.write_text("name,total_distance,gen_area,trailhead_lat\n"
+                    "Lake Trail,3,Olympics,\n"
+                    "Ridge Loop,4,Olympics,\n"
+                    "Bad,,Olympics,\n")
+    first = main.import_hikes(str(path))
+    second = main.import_hikes(str(path))
+    assert (first.imported, first.skipped) == (2, 1)
+    assert (second.imported, second.skipped) == (2, 1)
+    assert sqlite_storage.count() == 2
+
+
+def test_import_gpx_twice_updates(sqlite_storage, tmp_path):
+    points = "".join('<trkpt lat="%f" lon="-121.0"><ele>%d</ele></trkpt>' % (47 + i * 0.001, 500 + i)
+                     for i in range(50))
+    path = tmp_path / "track.gpx"
+    path.write_text('<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><name>Climb</name><trkseg>'
+                    + points + '</trkseg></trk></gpx>')
+    main.import_hikes(str(path))
+    main.import_hikes(str(path))
+    [row] = [row for batch in sqlite_storage.iter_hikes(10) for row in batch]
+    assert row[1] == "Climb"
+    assert row[12] == 47.0
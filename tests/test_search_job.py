@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def index(rows, monkeypatch):
+    index = main.HikeIndex([main.Hike.from_row(row) for row in rows])
+    monkeypatch.setattr(main, "hike_index", index)
+    return index
+
+
+# every message the job posts up to its last one
+def messages(job):
+    posted = []
+    while not posted or posted[-1][0] not in ("done", "failed"):
+        posted.append(job.messages.get(timeout=5))
+    return posted
+
+
+# remove a hike through a sync the first time fn is called, as the tk thread can while a search runs
+def remove_once(index, fn, hike_id):
+    calls = []
+
+    def removing(*args):
+        if not calls:
+            calls.append(args)
+            index.sync([], [hike_id])
+        return fn(*args)
+    return removing
+
+
+def test_restarts_after_a_row_is_removed(index, monkeypatch):
+    query = main.HikeQuery("", (("distance", None, 10.0),))
+    monkeypatch.setattr(index, "search", remove_once(index, index.search, index.rows[0].id))
+    posted = messages(main.SearchJob(query))
+    assert ("restart",) in posted
+    assert posted[-1][0] == "done"
+    assert 0 not in posted[-1][1]
+    assert posted[-1][1] == [row_id for row_id in index.live_ids() if index.rows[row_id].distance <= 10.0]
+
+
+def test_restart_drops_stale_candidates(index, monkeypatch):
+    query = main.HikeQuery("lake", ())
+    candidates = index.search(query)
+    removed = candidates[0]
+    monkeypatch.setattr(index, "matches", remove_once(index, index.matches, index.rows[removed].id))
+    posted = messages(main.SearchJob(query, candidates))
+    assert posted[-1][0] == "done"
+    assert removed not in posted[-1][1]
+    assert sorted(posted[-1][1]) == sorted(set(candidates) - {removed})
+
+
+def test_error_posts_failed(index, monkeypatch):
+    def broken(query):
+        raise ValueError("broken")
+    monkeypatch.setattr(index, "search", broken)
+    monkeypatch.setattr(threading, "excepthook", lambda args: None)
+    posted = messages(main.SearchJob(main.HikeQuery("", ())))
+    assert posted == [("failed", "broken")]
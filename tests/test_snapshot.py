@@ -0,0 +1,20 @@
+import math
+
+import main
+
+
+def all_rows(storage):
+    return [row for batch in storage.iter_hikes(64) for row in batch]
+
+
+def test_snapshot_round_trip_with_nulls(tmp_path, rows):
+    rows.append((len(rows) + 1, "Nulls", 1.0, 100, 200, None, "Easy", "Area", None, 0, 0, None, None, None))
+    snapshot = main.SnapshotStorage(str(tmp_path / "catalog.snapshot"))
+    snapshot.write_hikes(rows, "2026-01-01 00:00:00")
+    assert snapshot.count() == len(rows)
+    assert snapshot.high_water() == "2026-01-01 00:00:00"
+    for stored, row in zip(all_rows(snapshot), rows):
+        # NULL reads back as nan in float columns and as 0 or "" in the rest, which Hike.from_row treats the same
+        assert main.Hike.from_row(stored) == main.Hike.from_row(row)
+    last = main.Hike.from_row(all_rows(snapshot)[-1])
+    assert (last.prominence, last.keywords, last.lat, last.hours_from_home) == (0, "", None, math.inf)
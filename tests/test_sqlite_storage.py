@@ -0,0 +1,41 @@
+import main
+from conftest import make_rows
+
+
+def all_rows(storage):
+    return [row for batch in storage.iter_hikes(64) for row in batch]
+
+
+def test_sqlite_round_trip(sqlite_storage, rows):
+    sqlite_storage.write_hikes(rows)
+    assert sqlite_storage.count() == len(rows)
+    assert all_rows(sqlite_storage) == rows
+    assert sqlite_storage.max_id() == len(rows)
+
+
+def test_sqlite_search_matches_rows(sqlite_storage, rows):
+    sqlite_storage.write_hikes(rows)
+    query = main.HikeQuery("lake", (("distance", None, 8.0),))
+    expected = [row for row in rows if row[2] <= 8.0
+                and any("lake" in (row[i] or "").lower() for i in (1, 7, 11))]
+    assert sqlite_storage.search(query) == expected
+
+
+def test_sqlite_upsert_keeps_user_flags(sqlite_storage):
+    row = make_rows(1)[0]
+    sqlite_storage.write_hikes([row])
+    sqlite_storage.save_edits({row[0]: ("notes", 1)})
+    sqlite_storage.upsert_hikes([row[:1] + ("Renamed",) + row[2:9] + (0, 0) + row[11:]])
+    stored = all_rows(sqlite_storage)[0]
+    assert stored[1] == "Renamed"
+    assert stored[9] == 1
+    assert sqlite_storage.load_notes() == {row[0]: "notes"}
+
+
+def test_sqlite_save_without_notes_keeps_them(sqlite_storage):
+    row = make_rows(1)[0]
+    sqlite_storage.write_hikes([row])
+    sqlite_storage.save_edits({row[0]: ("notes", 0)})
+    sqlite_storage.save_edits({row[0]: (None, 1)})
+    assert all_rows(sqlite_storage)[0][9] == 1
+    assert sqlite_storage.load_notes() == {row[0]: "notes"}
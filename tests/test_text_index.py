@@ -0,0 +1,72 @@
+import pytest
+
+import main
+from conftest import make_rows
+
+KEYWORDS = ("lake", "lo", "e", "trail 1", "olympics", "views", "lake trail 1", "x", " ")
+
+
+def build(rows):
+    index = main.TextIndex()
+    for row_id, row in enumerate(rows):
+        index.add(row_id, row[1], row[7], row[11] or "")
+    return index
+
+
+def texts(rows):
+    return ["\n".join((row[1], row[7], row[11] or "")).lower() for row in rows]
+
+
+# 4 for the whole name down to 0 for a match outside the name
+def rank(name, keyword):
+    if name == keyword:
+        return 4
+    if name.startswith(keyword):
+        return 3
+    if " " + keyword in name:
+        return 2
+    return 1 if keyword in name else 0
+
+
+def check(index, expected_texts):
+    for keyword in KEYWORDS:
+        expected = [row_id for row_id, text in enumerate(expected_texts) if text is not None and keyword in text]
+        found = index.search(keyword)
+        assert sorted(found) == expected
+        # best rank first, then by row id
+        order = [(-rank(expected_texts[row_id].partition("\n")[0], keyword), row_id) for row_id in found]
+        assert order == sorted(order)
+
+
+def test_search_matches_substrings():
+    rows = make_rows(400)
+    check(build(rows), texts(rows))
+
+
+def test_search_while_building():
+    rows = make_rows(400)
+    index = main.TextIndex(texts(rows))
+    while not index.build(150):
+        check(index, texts(rows))
+    check(index, texts(rows))
+
+
+@pytest.mark.parametrize("built", [0, 150, 400])
+def test_search_after_updates(built):
+    rows = make_rows(400)
+    index = main.TextIndex(texts(rows))
+    index.build(built)
+    expected = texts(rows)
+    for row_id in range(0, 400, 7):
+        index.update(row_id, "Lake %d Loop" % row_id, "Olympics", "views")
+        expected[row_id] = "lake %d loop\nolympics\nviews" % row_id
+    for row_id in range(3, 400, 11):
+        index.remove(row_id)
+        expected[row_id] = None
+    for row_id in range(400, 420):
+        index.add(row_id, "Lake", "Area", "")
+        expected.append("lake\narea\n")
+    check(index, expected)
+    assert len(index) == len([text for text in expected if text is not None])
+    index.build(400)
+    check(index, expected)